@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.router.chat import chat_router
 from app.router.health import health_router
 from app.database.init_db import init_database
+from app.database.retention import CheckpointCompactor
 
 
 def create_app():
@@ -23,6 +24,26 @@ def create_app():
     
 
     init_database()
+
+    # Background retention job for old checkpoints (disabled unless
+    # CHECKPOINT_COMPACTION_INTERVAL is set).
+    compactor = CheckpointCompactor()
+    app.router.add_event_handler("startup", compactor.start)
+    app.router.add_event_handler("shutdown", compactor.stop)
+    app.state.checkpoint_compactor = compactor
+
+    # Batched updated_at writes for thread activity; flushed on shutdown.
+    from app.services.chatbot import activity_tracker
+    app.router.add_event_handler("startup", activity_tracker.start)
+    app.router.add_event_handler("shutdown", activity_tracker.stop)
+
+    # Optionally preload lazily imported components (WARMUP=embeddings,blogs).
+    from app.services import warmup
+    app.router.add_event_handler("startup", warmup.start)
+
+    # Let background document cleanup of deleted threads finish.
+    from app.services.cleanup import thread_purger
+    app.router.add_event_handler("shutdown", thread_purger.stop)
             
     # Include routers
     app.include_router(chat_router, prefix="/api", tags=["chat"])
@@ -2,7 +2,7 @@
 from .config import DatabaseConfig
 from .init_db import init_database
 from .mysql_checkpoint import MySQLCheckpointSaver
-from .models import Base, ThreadMetadata, DocumentMetadata, Checkpoint, CheckpointWrite
+from .models import Base, ThreadMetadata, DocumentMetadata, Message, Checkpoint, CheckpointWrite
 
 __all__ = [
     "DatabaseConfig",
@@ -11,6 +11,7 @@ __all__ = [
     "Base",
     "ThreadMetadata",
     "DocumentMetadata",
+    "Message",
     "Checkpoint",
     "CheckpointWrite"
 ]
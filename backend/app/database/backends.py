@@ -0,0 +1,180 @@
+"""Storage backends for the database layer
+
+The service was written against MySQL, but everything above the engine
+(checkpoint saver, thread metadata, retention) goes through SQLAlchemy. A
+backend supplies what does differ between engines:
+
+- connection URLs for the sync and the async driver,
+- engine options and per-connection setup (e.g. WAL mode on SQLite),
+- creating the database itself before the tables.
+
+Dialect-specific statements used by the checkpoint saver live next to the
+code that issues them and key on the engine's dialect name: native upserts
+in app.database.dialects, advisory locks in app.database.locks.
+
+The backend is chosen with DB_BACKEND (mysql, postgresql or sqlite); MySQL
+stays the default. DATABASE_URL overrides the URL of any backend.
+"""
+import os
+from urllib.parse import quote_plus
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+class StorageBackend:
+    """Base class: a server database reached with user/password/host/port"""
+
+    name = ""
+    driver = ""
+    async_driver = ""
+    default_port = 0
+
+    def __init__(self, config):
+        self.config = config
+
+    def _server_url(self, driver: str, database: str = "") -> str:
+        config = self.config
+        password = quote_plus(config.PASSWORD) if config.PASSWORD else ""
+        port = config.PORT or self.default_port
+        return f"{self.name}+{driver}://{config.USER}:{password}@{config.HOST}:{port}/{database}"
+
+    def connection_url(self) -> str:
+        if DATABASE_URL:
+            return DATABASE_URL
+        return self._server_url(self.driver, self.config.DATABASE)
+
+    def async_connection_url(self) -> str:
+        url = make_url(self.connection_url())
+        return url.set(drivername=f"{url.get_backend_name()}+{self.async_driver}").render_as_string(
+            hide_password=False
+        )
+
+    def engine_options(self) -> dict:
+        return self.config.get_pool_options()
+
+    def configure_engine(self, engine) -> None:
+        """Per-connection setup; engine is a sync Engine (or AsyncEngine.sync_engine)"""
+
+    def create_database(self) -> None:
+        """Create the database itself if the server does not have it yet"""
+
+
+class MySQLBackend(StorageBackend):
+    name = "mysql"
+    driver = "pymysql"
+    async_driver = "aiomysql"
+    default_port = 3306
+
+    def connection_url(self) -> str:
+        if DATABASE_URL:
+            return DATABASE_URL
+        return self._server_url(self.driver, self.config.DATABASE) + "?charset=utf8mb4"
+
+    def create_database(self) -> None:
+        url = make_url(self.connection_url())
+        engine = create_engine(url.set(database=""), isolation_level="AUTOCOMMIT")
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(f"CREATE DATABASE IF NOT EXISTS `{url.database}` CHARACTER SET utf8mb4"))
+        finally:
+            engine.dispose()
+
+
+class PostgreSQLBackend(StorageBackend):
+    name = "postgresql"
+    # psycopg 3 provides both the sync and the asyncio driver.
+    driver = "psycopg"
+    async_driver = "psycopg"
+    default_port = 5432
+
+    def create_database(self) -> None:
+        url = make_url(self.connection_url())
+        # CREATE DATABASE cannot run inside a transaction or in the target
+        # database, so connect to the maintenance database instead.
+        engine = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+        try:
+            with engine.connect() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": url.database}
+                ).scalar()
+                if not exists:
+                    try:
+                        conn.execute(text(f'CREATE DATABASE "{url.database}" ENCODING \'UTF8\''))
+                    except DBAPIError:
+                        # Another worker may have created it since the check.
+                        if not conn.execute(
+                            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": url.database}
+                        ).scalar():
+                            raise
+        finally:
+            engine.dispose()
+
+
+class SQLiteBackend(StorageBackend):
+    """Local database file for perf tests and single-node deployments"""
+
+    name = "sqlite"
+    driver = "pysqlite"
+    async_driver = "aiosqlite"
+    PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(__file__), "..", "storage", "chatbot.db"))
+    BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+    def connection_url(self) -> str:
+        if DATABASE_URL:
+            return DATABASE_URL
+        return f"sqlite:///{os.path.abspath(self.PATH)}"
+
+    def engine_options(self) -> dict:
+        options = dict(self.config.get_pool_options())
+        # Pooled connections are shared between request threads.
+        options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    def configure_engine(self, engine) -> None:
+        # Modules that build the engine at import time (the checkpoint
+        # saver's lock file) may run before init_database().
+        self.create_database()
+        busy_timeout = self.BUSY_TIMEOUT_MS
+
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # WAL lets readers run alongside the single writer; NORMAL sync
+            # is durable across application crashes in WAL mode.
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.close()
+
+    def create_database(self) -> None:
+        database = make_url(self.connection_url()).database
+        if database and database != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+
+
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "mariadb": MySQLBackend,
+    "postgresql": PostgreSQLBackend,
+    "postgres": PostgreSQLBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def get_backend(config, name: str = None) -> StorageBackend:
+    """Backend for DB_BACKEND (or name), or the one DATABASE_URL points at"""
+    name = (name or DB_BACKEND).lower()
+    if DATABASE_URL and name == "mysql" and "DB_BACKEND" not in os.environ:
+        name = make_url(DATABASE_URL).get_backend_name()
+    try:
+        return BACKENDS[name](config)
+    except KeyError:
+        raise ValueError(
+            f"Unsupported DB_BACKEND '{name}' (expected one of: {', '.join(sorted(BACKENDS))})"
+        )
@@ -0,0 +1,142 @@
+"""In-memory cache of the latest decoded checkpoint per thread
+
+ChatService reads a thread's state several times per request (load,
+regenerate, edit, the persist step after streaming), and each read used to
+query the newest row and decode (and, for deltas, rebuild) its blob. The
+saver keeps the newest checkpoint tuple of recently used
+(thread_id, checkpoint_ns) pairs here instead:
+
+- entries are replaced on put, so a thread's own writes keep it warm,
+- the cache is bounded by an estimate of the decoded size in bytes and
+  evicts least recently used threads first,
+- hits and misses are counted (see MySQLCheckpointSaver.stats()).
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langgraph.checkpoint.base import CheckpointTuple, copy_checkpoint
+
+CACHE_MAX_BYTES = int(os.getenv("CHECKPOINT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# A single checkpoint larger than this share of the budget is not cached.
+_MAX_ENTRY_SHARE = 4
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """Rough size in bytes of a decoded checkpoint value.
+
+    Only strings and containers are counted (messages by their content and
+    tool calls), which dominates chat state and is much cheaper than an
+    exact measurement.
+    """
+    if _depth > 8:
+        return 0
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(
+            estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_size(v, _depth + 1) for v in value)
+    content = getattr(value, "content", None)
+    if content is not None:
+        size = estimate_size(content, _depth + 1)
+        size += estimate_size(getattr(value, "tool_calls", None) or [], _depth + 1)
+        return size + 64
+    return 16
+
+
+class LatestCheckpointCache:
+    """Size-bounded LRU of (thread_id, checkpoint_ns) -> latest CheckpointTuple"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else CACHE_MAX_BYTES
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: tuple, expected_id: Optional[str] = None) -> Optional[CheckpointTuple]:
+        """Return a copy of the cached tuple, or None (counted as a miss).
+
+        With expected_id, an entry for any other checkpoint id is stale: it
+        is dropped and the lookup counts as a miss.
+        """
+        with self._guard:
+            entry = self._entries.get(key)
+            if entry is not None and expected_id is not None:
+                if entry[0].config["configurable"]["checkpoint_id"] != expected_id:
+                    del self._entries[key]
+                    self._bytes -= entry[1]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            checkpoint_tuple = entry[0]
+        # Callers may mutate what they get back; the cached copy must not change.
+        return checkpoint_tuple._replace(checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint))
+
+    def peek_id(self, key: tuple) -> Optional[str]:
+        """Checkpoint id cached for key, without touching LRU order or counters"""
+        with self._guard:
+            entry = self._entries.get(key)
+            return entry[0].config["configurable"]["checkpoint_id"] if entry else None
+
+    def put(self, key: tuple, checkpoint_tuple: CheckpointTuple) -> None:
+        """Store checkpoint_tuple as the latest for key unless a newer one is cached"""
+        if not self.enabled:
+            return
+        checkpoint_id = checkpoint_tuple.config["configurable"]["checkpoint_id"]
+        size = estimate_size(checkpoint_tuple.checkpoint.get("channel_values", {})) + 256
+        if size * _MAX_ENTRY_SHARE > self.max_bytes:
+            self.discard(key)
+            return
+        checkpoint_tuple = checkpoint_tuple._replace(checkpoint=copy_checkpoint(checkpoint_tuple.checkpoint))
+        with self._guard:
+            current = self._entries.get(key)
+            if current is not None:
+                if current[0].config["configurable"]["checkpoint_id"] > checkpoint_id:
+                    return
+                self._bytes -= current[1]
+            self._entries[key] = (checkpoint_tuple, size)
+            self._entries.move_to_end(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def discard(self, key: tuple) -> None:
+        with self._guard:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def invalidate(self, thread_id: str) -> None:
+        """Drop every namespace cached for thread_id"""
+        with self._guard:
+            for key in [k for k in self._entries if k[0] == thread_id]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._guard:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
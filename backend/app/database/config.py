@@ -1,9 +1,10 @@
-"""MySQL Database Configuration"""
+"""Database Configuration (MySQL by default, see app.database.backends)"""
 import os
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from urllib.parse import quote_plus
+from app.database.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from app.database.backends import get_backend
 
 load_dotenv()
 
@@ -11,20 +12,54 @@ load_dotenv()
 class DatabaseConfig:
     """Database configuration"""
     
-    HOST = os.getenv("MYSQL_HOST", "localhost")
-    PORT = int(os.getenv("MYSQL_PORT", "3306"))
-    USER = os.getenv("MYSQL_USER", "root")
-    PASSWORD = os.getenv("MYSQL_PASSWORD", "")
-    DATABASE = os.getenv("MYSQL_DATABASE", "chatbot_db")
+    # DB_* applies to any server backend; the MYSQL_* names keep working.
+    HOST = os.getenv("DB_HOST") or os.getenv("MYSQL_HOST", "localhost")
+    # 0 means the backend's default port
+    PORT = int(os.getenv("DB_PORT") or os.getenv("MYSQL_PORT") or "0")
+    USER = os.getenv("DB_USER") or os.getenv("MYSQL_USER", "root")
+    PASSWORD = os.getenv("DB_PASSWORD") or os.getenv("MYSQL_PASSWORD", "")
+    DATABASE = os.getenv("DB_NAME") or os.getenv("MYSQL_DATABASE", "chatbot_db")
+
+    # Connection pool (applies to the sync and the async engine separately)
+    POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+    POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
     
+    _backend = None
     _engine = None
     _session_factory = None
+    _async_engine = None
+    _async_session_factory = None
     
+    @classmethod
+    def get_backend(cls):
+        """Get the storage backend selected by DB_BACKEND"""
+        if cls._backend is None:
+            cls._backend = get_backend(cls)
+        return cls._backend
+
     @classmethod
     def get_connection_url(cls) -> str:
-        """Get MySQL connection URL"""
-        password = quote_plus(cls.PASSWORD) if cls.PASSWORD else ""
-        return f"mysql+pymysql://{cls.USER}:{password}@{cls.HOST}:{cls.PORT}/{cls.DATABASE}?charset=utf8mb4"
+        """Get database connection URL"""
+        return cls.get_backend().connection_url()
+
+    @classmethod
+    def get_async_connection_url(cls) -> str:
+        """Get database connection URL for the async driver"""
+        return cls.get_backend().async_connection_url()
+    
+    @classmethod
+    def get_pool_options(cls) -> dict:
+        """Pool keyword arguments shared by the sync and async engines"""
+        return {
+            "pool_size": cls.POOL_SIZE,
+            "max_overflow": cls.MAX_OVERFLOW,
+            "pool_timeout": cls.POOL_TIMEOUT,
+            "pool_recycle": cls.POOL_RECYCLE,
+            "pool_pre_ping": cls.POOL_PRE_PING,
+        }
     
     @classmethod
     def get_engine(cls):
@@ -32,9 +67,10 @@ class DatabaseConfig:
         if cls._engine is None:
             cls._engine = create_engine(
                 cls.get_connection_url(),
-                pool_pre_ping=True,
-                pool_recycle=3600
+                poolclass=InstrumentedQueuePool,
+                **cls.get_backend().engine_options()
             )
+            cls.get_backend().configure_engine(cls._engine)
         return cls._engine
     
     @classmethod
@@ -48,3 +84,28 @@ class DatabaseConfig:
     def create_session(cls):
         """Create new database session"""
         return cls.get_session_factory()()
+
+    @classmethod
+    def get_async_engine(cls):
+        """Get SQLAlchemy async engine (used by the async checkpoint API)"""
+        if cls._async_engine is None:
+            # Imported here so sync-only workers don't need greenlet/aiomysql.
+            from sqlalchemy.ext.asyncio import create_async_engine
+            cls._async_engine = create_async_engine(
+                cls.get_async_connection_url(),
+                poolclass=InstrumentedAsyncQueuePool,
+                **cls.get_backend().engine_options()
+            )
+            cls.get_backend().configure_engine(cls._async_engine.sync_engine)
+        return cls._async_engine
+
+    @classmethod
+    def get_async_session_factory(cls):
+        """Get async session factory"""
+        if cls._async_session_factory is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+            cls._async_session_factory = async_sessionmaker(
+                bind=cls.get_async_engine(),
+                expire_on_commit=False
+            )
+        return cls._async_session_factory
@@ -0,0 +1,94 @@
+"""Delta encoding for checkpoints
+
+A LangGraph checkpoint carries the full value of every channel, so for a chat
+thread each checkpoint repeats the entire ``messages`` list. When a
+checkpoint's parent is known, only what changed is stored instead:
+
+- list channels that extend the parent's list (the append-only ``messages``
+  case) store just the new suffix,
+- channels whose value is unchanged store nothing,
+- everything else (removals, edits, scalars that changed) is stored in full.
+
+A delta records its base checkpoint id and its depth (number of deltas since
+the last full snapshot). Readers rebuild the channel values by walking back
+to the nearest snapshot and replaying forward.
+"""
+from typing import Any
+
+DELTA_KEY = "__delta__"
+DELTA_VERSION = 1
+
+
+def _extends(base: list, value: list) -> bool:
+    """True if value starts with every element of base (in order)."""
+    if len(value) < len(base):
+        return False
+    for old, new in zip(base, value):
+        if old is not new and old != new:
+            return False
+    return True
+
+
+def encode_delta(checkpoint: dict, base_id: str, base_values: dict, depth: int) -> dict:
+    """Return a delta payload for checkpoint relative to base_values"""
+    appends: dict[str, list] = {}
+    values: dict[str, Any] = {}
+    same: list[str] = []
+
+    for channel, value in checkpoint.get("channel_values", {}).items():
+        if channel in base_values:
+            base = base_values[channel]
+            if base is value:
+                same.append(channel)
+                continue
+            if isinstance(value, list) and isinstance(base, list) and _extends(base, value):
+                if len(value) == len(base):
+                    same.append(channel)
+                else:
+                    appends[channel] = value[len(base):]
+                continue
+            if type(value) is type(base) and not isinstance(value, list) and value == base:
+                same.append(channel)
+                continue
+        values[channel] = value
+
+    header = {k: v for k, v in checkpoint.items() if k != "channel_values"}
+    return {
+        DELTA_KEY: DELTA_VERSION,
+        "base": base_id,
+        "depth": depth,
+        "checkpoint": header,
+        "appends": appends,
+        "values": values,
+        "same": same,
+    }
+
+
+def is_delta(payload: Any) -> bool:
+    return isinstance(payload, dict) and DELTA_KEY in payload
+
+
+def apply_delta(delta: dict, base_values: dict) -> dict:
+    """Rebuild the full checkpoint described by delta on top of base_values"""
+    channel_values = dict(delta["values"])
+    for channel in delta["same"]:
+        channel_values[channel] = base_values[channel]
+    for channel, suffix in delta["appends"].items():
+        channel_values[channel] = list(base_values[channel]) + list(suffix)
+
+    checkpoint = dict(delta["checkpoint"])
+    checkpoint["channel_values"] = channel_values
+    return checkpoint
+
+
+def snapshot_values(channel_values: dict) -> dict:
+    """Copy channel values for use as a future delta base.
+
+    Lists are copied so a caller appending to its own list in place can never
+    change what a later delta is computed against.
+    """
+    return {
+        channel: list(value) if isinstance(value, list) else value
+        for channel, value in channel_values.items()
+    }
+
@@ -0,0 +1,79 @@
+"""Dialect-specific bulk write helpers
+
+SQLAlchemy has no portable upsert, so these helpers pick the native form for
+the session's dialect: ``INSERT ... ON DUPLICATE KEY UPDATE`` on MySQL and
+``INSERT ... ON CONFLICT`` on PostgreSQL/SQLite. Every call is a single
+multi-row statement, i.e. one round trip regardless of the number of rows.
+"""
+from typing import Iterable, Sequence
+
+
+def _primary_key(table) -> list[str]:
+    return [column.name for column in table.primary_key.columns]
+
+
+def _insert_for(session, table):
+    dialect = session.get_bind().dialect.name
+    if dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return dialect, None
+    return dialect, insert(table)
+
+
+def _merge_rows(session, model, rows: Sequence[dict]) -> None:
+    # Portable (slow) fallback for dialects without a native upsert.
+    for row in rows:
+        session.merge(model(**row))
+    session.flush()
+
+
+def upsert(session, model, rows: Sequence[dict], update_columns: Iterable[str]) -> None:
+    """Insert rows, updating update_columns on primary-key conflicts"""
+    if not rows:
+        return
+    table = model.__table__
+    dialect, stmt = _insert_for(session, table)
+    if stmt is None:
+        _merge_rows(session, model, rows)
+        return
+
+    stmt = stmt.values(list(rows))
+    update_columns = list(update_columns)
+    if dialect in ("mysql", "mariadb"):
+        stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_columns})
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=_primary_key(table),
+            set_={c: stmt.excluded[c] for c in update_columns}
+        )
+    session.execute(stmt)
+
+
+def insert_ignore(session, model, rows: Sequence[dict]) -> None:
+    """Insert rows, leaving any existing row with the same primary key untouched"""
+    if not rows:
+        return
+    table = model.__table__
+    dialect, stmt = _insert_for(session, table)
+    if stmt is None:
+        for row in rows:
+            key = tuple(row[c] for c in _primary_key(table))
+            if session.get(model, key) is None:
+                session.add(model(**row))
+        session.flush()
+        return
+
+    stmt = stmt.values(list(rows))
+    if dialect in ("mysql", "mariadb"):
+        # A no-op assignment instead of INSERT IGNORE, which would also
+        # swallow unrelated errors (truncation, FK violations).
+        first_pk = _primary_key(table)[0]
+        stmt = stmt.on_duplicate_key_update({first_pk: table.c[first_pk]})
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=_primary_key(table))
+    session.execute(stmt)
@@ -1,24 +1,15 @@
 """Database Initialization Script"""
-from sqlalchemy import create_engine, text
-from app.database import DatabaseConfig
-from app.database.models import Base
+from app.database.migrations import migrate
 
 
 def init_database():
-    """Initialize database and create tables"""
+    """Initialize database and bring the schema up to date.
+
+    A single read of schema_version when the schema is current; the
+    database, tables and indexes are only created or altered when behind.
+    """
     try:
-        # Create database
-        engine = create_engine(
-            f"mysql+pymysql://{DatabaseConfig.USER}:{DatabaseConfig.PASSWORD}@{DatabaseConfig.HOST}:{DatabaseConfig.PORT}",
-            isolation_level="AUTOCOMMIT"
-        )
-        with engine.connect() as conn:
-            conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {DatabaseConfig.DATABASE} CHARACTER SET utf8mb4"))
-        engine.dispose()
-        
-        # Create tables
-        Base.metadata.create_all(DatabaseConfig.get_engine())
-        
+        migrate()
         return True
     except Exception as e:
         print(f"Database initialization error: {e}")
@@ -0,0 +1,205 @@
+"""Per-thread write coordination for the checkpoint saver
+
+LangGraph can write the same chat thread from parallel nodes, and several
+uvicorn workers (or hosts) can serve the same thread concurrently. Writers
+of one thread_id are serialized in two layers:
+
+1. An in-process threading.Lock per thread_id, shared by the sync and the
+   async API so a sync and an async writer of one worker exclude each
+   other. Coroutines first queue on an asyncio.Lock and then take the
+   thread lock off the event loop (see ``held``/``aheld``). Locks live in
+   WeakValueDictionaries: an entry disappears as soon as no caller holds
+   it, so the maps stay bounded by the number of in-flight writes.
+2. A cross-process lock:
+   - MySQL: ``GET_LOCK`` / ``RELEASE_LOCK`` on the writer's own session
+     (connection-scoped, freed by the server if the worker dies),
+   - PostgreSQL: ``pg_advisory_xact_lock`` on the writer's session
+     (released at commit/rollback),
+   - SQLite: a POSIX byte-range lock on a ``<db>.locks`` file next to the
+     database, which covers several processes on one host (tests and
+     single-node deployments). It is taken together with the in-process
+     lock, which it relies on: POSIX record locks do not exclude threads of
+     one process. Without fcntl (Windows) only the in-process layer
+     applies.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from sqlalchemy import text
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+LOCK_TIMEOUT_SECONDS = int(os.getenv("CHECKPOINT_LOCK_TIMEOUT", "10"))
+# Byte-range slots in the SQLite lock file. POSIX record locks belong to the
+# process, so two threads of one process hashing to the same slot can release
+# each other's hold early; with 64k slots that is negligible for a stand-in.
+_SQLITE_LOCK_SLOTS = 1 << 16
+
+
+class ThreadLockTimeout(TimeoutError):
+    """Raised when the cross-process lock for a thread cannot be acquired"""
+
+
+def _digest(thread_id: str) -> bytes:
+    return hashlib.sha1(thread_id.encode("utf-8")).digest()
+
+
+async def _acquire_off_loop(acquire, release) -> None:
+    """Run a blocking acquire in a worker thread; if the caller is cancelled
+    while it waits, the lock is released again once the acquire completes"""
+    task = asyncio.ensure_future(asyncio.to_thread(acquire))
+    try:
+        await asyncio.shield(task)
+    except asyncio.CancelledError:
+        def _give_back(done):
+            if not done.cancelled() and done.exception() is None:
+                release()
+        task.add_done_callback(_give_back)
+        raise
+
+
+class ThreadLockCoordinator:
+    """Serializes checkpoint writes per thread_id within and across processes"""
+
+    def __init__(self, engine, timeout: Optional[int] = None):
+        self.dialect = engine.dialect.name
+        self.timeout = timeout if timeout is not None else LOCK_TIMEOUT_SECONDS
+        self._local_locks = weakref.WeakValueDictionary()
+        self._async_locks = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+        self._lock_file = None
+        if self.dialect == "sqlite" and fcntl is not None:
+            database = engine.url.database
+            if database and database != ":memory:":
+                self._lock_file = open(f"{database}.locks", "a+b")
+
+    # -- in-process layer -----------------------------------------------------
+
+    def local_lock(self, thread_id: str) -> threading.Lock:
+        """The thread's in-process lock, shared by the sync and async API"""
+        with self._guard:
+            lock = self._local_locks.get(thread_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._local_locks[thread_id] = lock
+            return lock
+
+    def async_lock(self, thread_id: str) -> asyncio.Lock:
+        # Only used from the event loop thread, so no guard is needed.
+        lock = self._async_locks.get(thread_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._async_locks[thread_id] = lock
+        return lock
+
+    @contextmanager
+    def held(self, thread_id: str):
+        """Hold thread_id's in-process lock and, on SQLite, its file lock"""
+        with self.local_lock(thread_id):
+            self._lock_slot(thread_id)
+            try:
+                yield
+            finally:
+                self._unlock_slot(thread_id)
+
+    @asynccontextmanager
+    async def aheld(self, thread_id: str):
+        """held() for coroutines: waits in a worker thread, never on the loop"""
+        async with self.async_lock(thread_id):
+            lock = self.local_lock(thread_id)
+            if not lock.acquire(blocking=False):
+                await _acquire_off_loop(lock.acquire, lock.release)
+            try:
+                if self._lock_file is not None:
+                    await _acquire_off_loop(
+                        lambda: self._lock_slot(thread_id), lambda: self._unlock_slot(thread_id)
+                    )
+                try:
+                    yield
+                finally:
+                    self._unlock_slot(thread_id)
+            finally:
+                lock.release()
+
+    def stats(self) -> dict:
+        return {
+            "local_locks": len(self._local_locks),
+            "async_locks": len(self._async_locks),
+            "backend": self.dialect,
+        }
+
+    # -- cross-process layer --------------------------------------------------
+
+    def _acquire(self, session, thread_id: str) -> None:
+        if self.dialect in ("mysql", "mariadb"):
+            # MySQL lock names are limited to 64 characters.
+            name = "ckpt:" + _digest(thread_id).hex()
+            acquired = session.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"), {"name": name, "timeout": self.timeout}
+            ).scalar()
+            if acquired != 1:
+                raise ThreadLockTimeout(f"Timed out waiting for checkpoint lock of thread {thread_id}")
+        elif self.dialect == "postgresql":
+            key = int.from_bytes(_digest(thread_id)[:8], "big", signed=True)
+            session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": key})
+        # SQLite's file lock is taken by held()/aheld(), off the event loop.
+
+    def _release(self, session, thread_id: str) -> None:
+        if self.dialect in ("mysql", "mariadb"):
+            name = "ckpt:" + _digest(thread_id).hex()
+            try:
+                session.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": name})
+            except Exception as e:
+                # The server frees the lock anyway when the connection drops.
+                print(f"Warning: failed to release checkpoint lock for thread {thread_id}: {e}")
+        # PostgreSQL xact locks are released by commit/rollback.
+
+    def _lock_slot(self, thread_id: str) -> None:
+        """Take thread_id's byte in the SQLite lock file (blocking; no-op elsewhere)"""
+        if self._lock_file is None:
+            return
+        slot = int.from_bytes(_digest(thread_id)[:4], "big") % _SQLITE_LOCK_SLOTS
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fcntl.lockf(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise ThreadLockTimeout(f"Timed out waiting for checkpoint lock of thread {thread_id}")
+                time.sleep(0.01)
+
+    def _unlock_slot(self, thread_id: str) -> None:
+        if self._lock_file is None:
+            return
+        slot = int.from_bytes(_digest(thread_id)[:4], "big") % _SQLITE_LOCK_SLOTS
+        fcntl.lockf(self._lock_file, fcntl.LOCK_UN, 1, slot)
+
+    @contextmanager
+    def distributed(self, session, thread_id: str):
+        """Hold the cross-process lock for thread_id on session.
+
+        Enter it while holding the thread's local lock, so a worker never
+        queues more than one of its own connections on the database lock.
+        """
+        self._acquire(session, thread_id)
+        try:
+            yield
+        except BaseException:
+            # Roll back before releasing so the release statement does not run
+            # on a failed transaction (and the lock is never left behind on a
+            # pooled connection).
+            session.rollback()
+            raise
+        finally:
+            self._release(session, thread_id)
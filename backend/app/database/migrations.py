@@ -0,0 +1,308 @@
+"""Versioned schema migrations
+
+Every worker used to run CREATE DATABASE IF NOT EXISTS on a separate
+engine and Base.metadata.create_all (which inspects every table) at boot.
+The schema now carries a version instead: ``schema_version`` holds one row
+per applied migration, and startup reads ``MAX(version)`` from its primary
+key. When that matches the latest migration nothing else runs; only a new
+database, or one behind the code, takes the slow path:
+
+1. create the database (server backends) if it is missing,
+2. take a cross-process migration lock so workers starting together do not
+   race each other through the DDL,
+3. create ``schema_version`` if needed, re-read the version and apply the
+   pending migrations in order.
+
+Migrations are idempotent (they check before they change anything), so a
+database created by an older release without ``schema_version`` is brought
+up to date by running them all. Never edit an applied migration; append a
+new one to MIGRATIONS.
+
+Run with ``python -m app.database.migrations``.
+"""
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import exists, func, insert, select, text
+
+from app.database.config import DatabaseConfig
+from app.database.models import (
+    Base,
+    Checkpoint,
+    CheckpointWrite,
+    DocumentMetadata,
+    Message,
+    SchemaVersion,
+    ThreadMetadata,
+)
+from app.database.search import ensure_search_index
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("DB_MIGRATION_LOCK_TIMEOUT", "60"))
+_LOCK_NAME = "opengpt:schema"
+# pg_advisory_lock key (any constant shared by all workers).
+_PG_LOCK_KEY = 0x6F70656E677074
+# 100-ns intervals between the UUID epoch (1582-10-15) and the Unix epoch.
+_UUID_EPOCH_TICKS = 0x01B21DD213814000
+
+
+# -- migrations ---------------------------------------------------------------
+
+def create_core_tables(engine) -> None:
+    tables = [model.__table__ for model in (ThreadMetadata, DocumentMetadata, Checkpoint, CheckpointWrite)]
+    Base.metadata.create_all(engine, tables=tables)
+
+
+def widen_checkpoint_blobs(engine) -> None:
+    """BLOB -> LONGBLOB on MySQL (BLOB truncates checkpoints at 64KB)"""
+    if engine.dialect.name not in ("mysql", "mariadb"):
+        return
+    columns = {
+        ("checkpoints", "checkpoint"): "LONGBLOB NOT NULL",
+        ("checkpoints", "meta"): "LONGBLOB NOT NULL",
+        ("checkpoint_writes", "value"): "LONGBLOB NULL",
+    }
+    with engine.begin() as conn:
+        current = {
+            (row.table_name, row.column_name): row.data_type.lower()
+            for row in conn.execute(text(
+                "SELECT table_name AS table_name, column_name AS column_name, data_type AS data_type "
+                "FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND table_name IN ('checkpoints', 'checkpoint_writes')"
+            ))
+        }
+        for table in ("checkpoints", "checkpoint_writes"):
+            changes = [
+                f"MODIFY `{column}` {definition}"
+                for (name, column), definition in columns.items()
+                if name == table and current.get((name, column)) not in (None, "longblob")
+            ]
+            if changes:
+                # Rebuilds the table; only ever runs once per database.
+                print(f"Widening {table} blob columns to LONGBLOB...")
+                conn.execute(text(f"ALTER TABLE `{table}` {', '.join(changes)}"))
+
+
+def _checkpoint_time(checkpoint_id: str) -> Optional[datetime]:
+    """UTC time encoded in a LangGraph (UUIDv6) checkpoint id, or None"""
+    try:
+        value = uuid.UUID(checkpoint_id)
+    except (TypeError, ValueError):
+        return None
+    if value.version != 6:
+        return None
+    ticks = (value.time_low << 28) | (value.time_mid << 12) | (value.time_hi_version & 0x0FFF)
+    return datetime(1970, 1, 1) + timedelta(microseconds=(ticks - _UUID_EPOCH_TICKS) // 10)
+
+
+def backfill_thread_metadata(engine=None) -> None:
+    """Create thread_metadata rows for threads that only exist as checkpoints.
+
+    Thread listing is served from thread_metadata, so older threads saved
+    without a metadata row would otherwise disappear from the sidebar. The
+    sidebar is ordered by updated_at, so created_at/updated_at come from the
+    times encoded in the thread's first and last checkpoint ids rather than
+    from the time the backfill runs.
+    """
+    engine = engine or DatabaseConfig.get_engine()
+    missing = select(
+        Checkpoint.thread_id, func.min(Checkpoint.checkpoint_id), func.max(Checkpoint.checkpoint_id)
+    ).where(
+        ~exists().where(ThreadMetadata.thread_id == Checkpoint.thread_id)
+    ).group_by(Checkpoint.thread_id)
+    with engine.begin() as conn:
+        threads = conn.execute(missing).all()
+        if not threads:
+            return
+        # Checkpoint ids carry UTC; map them onto the database clock.
+        utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+        db_now = conn.execute(select(func.current_timestamp())).scalar()
+        if not isinstance(db_now, datetime):
+            db_now = utc_now
+        db_now = db_now.replace(tzinfo=None, microsecond=0)
+        offset = db_now - utc_now
+
+        def _at(checkpoint_id):
+            at = _checkpoint_time(checkpoint_id)
+            return db_now if at is None else (at + offset).replace(microsecond=0)
+
+        conn.execute(insert(ThreadMetadata), [
+            {"thread_id": thread_id, "title": "New Chat", "created_at": _at(first), "updated_at": _at(last)}
+            for thread_id, first, last in threads
+        ])
+        print(f"Backfilled metadata for {len(threads)} threads")
+
+
+def create_messages_table(engine) -> None:
+    Message.__table__.create(engine, checkfirst=True)
+
+
+# Migration 5's SQLite index, keyed by messages.rowid. Frozen here as
+# released; app.database.search only knows the current layout (migration 6).
+_SEARCH_V5_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "content, content='messages', content_rowid='rowid', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.rowid, old.content); "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.rowid, new.content); END",
+)
+
+
+def create_search_index_v5(engine) -> None:
+    """Full-text index over message history, as first released.
+
+    Search stays unavailable, but the migration is recorded and the app
+    still starts, if the engine cannot build it (e.g. SQLite without FTS5).
+    """
+    try:
+        with engine.begin() as conn:
+            dialect = engine.dialect.name
+            if dialect in ("mysql", "mariadb"):
+                indexed = conn.execute(text(
+                    "SELECT COUNT(*) FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = 'messages' "
+                    "AND index_name = 'ft_messages_content'"
+                )).scalar()
+                if not indexed:
+                    print("Building full-text index on messages (one-time)...")
+                    conn.execute(text("ALTER TABLE messages ADD FULLTEXT INDEX ft_messages_content (content)"))
+            elif dialect == "sqlite":
+                created = not conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+                )).first()
+                for statement in _SEARCH_V5_SQLITE_DDL:
+                    conn.execute(text(statement))
+                if created:
+                    conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+            elif dialect == "postgresql":
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_messages_content_fts ON messages "
+                    "USING GIN (to_tsvector('english', content))"
+                ))
+    except Exception as e:
+        print(f"Warning: full-text search index unavailable: {e}")
+
+
+def build_search_index(engine) -> None:
+    """Current full-text index (see app.database.search).
+
+    Search stays unavailable, but the migration is recorded and the app
+    still starts, if the engine cannot build it (e.g. SQLite without FTS5);
+    ``python -m app.database.search`` builds it later.
+    """
+    try:
+        ensure_search_index(engine)
+    except Exception as e:
+        print(f"Warning: full-text search index unavailable: {e}")
+
+
+# (version, description, function). Append only.
+MIGRATIONS = [
+    (1, "create core tables", create_core_tables),
+    (2, "widen checkpoint blobs to LONGBLOB", widen_checkpoint_blobs),
+    (3, "backfill thread metadata", backfill_thread_metadata),
+    (4, "create messages table", create_messages_table),
+    (5, "full-text index on messages", create_search_index_v5),
+    (6, "key the SQLite full-text index by stable ids", build_search_index),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# -- runner -------------------------------------------------------------------
+
+def current_version(engine) -> Optional[int]:
+    """Applied schema version, or None if the database or table is missing"""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+    except Exception:
+        return None
+
+
+@contextmanager
+def migration_lock(engine):
+    """Cross-process lock held while migrations are applied"""
+    dialect = engine.dialect.name
+    if dialect in ("mysql", "mariadb", "postgresql"):
+        with engine.connect() as conn:
+            if dialect == "postgresql":
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _PG_LOCK_KEY})
+            else:
+                acquired = conn.execute(
+                    text("SELECT GET_LOCK(:name, :timeout)"),
+                    {"name": _LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT}
+                ).scalar()
+                if acquired != 1:
+                    raise TimeoutError("Timed out waiting for the schema migration lock")
+            conn.commit()
+            try:
+                yield
+            finally:
+                if dialect == "postgresql":
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _PG_LOCK_KEY})
+                else:
+                    conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": _LOCK_NAME})
+                conn.commit()
+    elif dialect == "sqlite" and fcntl is not None and engine.url.database not in (None, "", ":memory:"):
+        with open(os.path.abspath(engine.url.database) + ".migrate.lock", "a+") as handle:
+            deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT
+            while True:
+                try:
+                    fcntl.lockf(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError("Timed out waiting for the schema migration lock")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fcntl.lockf(handle, fcntl.LOCK_UN)
+    else:
+        yield
+
+
+def migrate() -> int:
+    """Bring the schema up to LATEST_VERSION; returns the number of migrations applied"""
+    engine = DatabaseConfig.get_engine()
+    version = current_version(engine)
+    if version is not None and version >= LATEST_VERSION:
+        return 0
+
+    if version is None:
+        # New database, or one created before schema_version existed. The
+        # server-side lock needs the database, so this runs unlocked; it
+        # tolerates another worker creating it at the same time.
+        DatabaseConfig.get_backend().create_database()
+
+    applied = 0
+    with migration_lock(engine):
+        SchemaVersion.__table__.create(engine, checkfirst=True)
+        # Another worker may have migrated while this one waited.
+        version = current_version(engine) or 0
+        for number, description, migration in MIGRATIONS:
+            if number <= version:
+                continue
+            started = time.perf_counter()
+            migration(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(SchemaVersion).values(version=number, name=description))
+            applied += 1
+            print(f"Applied migration {number} ({description}) in {time.perf_counter() - started:.2f}s")
+    return applied
+
+
+if __name__ == "__main__":
+    migrate()
@@ -3,11 +3,27 @@ SQLAlchemy ORM Models for Chatbot Database
 """
 from datetime import datetime
 from sqlalchemy import Column, String, Integer, TIMESTAMP, Text, LargeBinary, ForeignKeyConstraint, Index
+from sqlalchemy.dialects.mysql import LONGBLOB, LONGTEXT
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
 Base = declarative_base()
 
+# Checkpoint blobs: BLOB caps at 64KB on MySQL, so use LONGBLOB there
+# (BYTEA on PostgreSQL, BLOB on SQLite).
+Blob = LargeBinary().with_variant(LONGBLOB(), "mysql", "mariadb")
+# Message text: TEXT caps at 64KB on MySQL as well.
+LongText = Text().with_variant(LONGTEXT(), "mysql", "mariadb")
+
+
+class SchemaVersion(Base):
+    """Schema version table - one row per applied migration"""
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(191), nullable=False)
+    applied_at = Column(TIMESTAMP, default=func.current_timestamp())
+
 
 class ThreadMetadata(Base):
     """Thread metadata table - stores conversation thread information"""
@@ -45,6 +61,22 @@ class DocumentMetadata(Base):
     )
 
 
+class Message(Base):
+    """Messages table - read model of each thread's visible conversation.
+
+    Rebuilt from the latest checkpoint at the end of every persisted turn so
+    history can be paged by (thread_id, seq) without loading checkpoints.
+    """
+    __tablename__ = "messages"
+
+    thread_id = Column(String(191), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    message_id = Column(String(191), nullable=True)
+    role = Column(String(16), nullable=False)
+    content = Column(LongText, nullable=False)
+    created_at = Column(TIMESTAMP, default=func.current_timestamp())
+
+
 class Checkpoint(Base):
     """Checkpoints table - stores LangGraph conversation state"""
     __tablename__ = "checkpoints"
@@ -54,8 +86,8 @@ class Checkpoint(Base):
     checkpoint_id = Column(String(191), primary_key=True)
     parent_checkpoint_id = Column(String(191), nullable=True)
     type = Column(String(128), nullable=True)
-    checkpoint = Column(LargeBinary, nullable=False)
-    meta = Column(LargeBinary, nullable=False)
+    checkpoint = Column(Blob, nullable=False)
+    meta = Column(Blob, nullable=False)
     
     __table_args__ = (
         Index("idx_parent", "thread_id", "checkpoint_ns", "parent_checkpoint_id"),
@@ -73,7 +105,7 @@ class CheckpointWrite(Base):
     idx = Column(Integer, primary_key=True)
     channel = Column(String(128), nullable=False)
     type = Column(String(128), nullable=True)
-    value = Column(LargeBinary, nullable=True)
+    value = Column(Blob, nullable=True)
     
     __table_args__ = (
         ForeignKeyConstraint(
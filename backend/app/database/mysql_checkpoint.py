@@ -1,11 +1,20 @@
-import pickle
+import asyncio
+import os
 import threading
 import time
-from typing import Optional, Any, Iterator
-from sqlalchemy import select
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional, Any, Iterator, AsyncIterator
+from sqlalchemy import select, func, or_
 from sqlalchemy.exc import SQLAlchemyError
-from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointTuple
+from langgraph.checkpoint.base import BaseCheckpointSaver, Checkpoint, CheckpointTuple, copy_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
 from app.database.config import DatabaseConfig
+from app.database.serde import CheckpointSerializer
+from app.database.locks import ThreadLockCoordinator
+from app.database.cache import LatestCheckpointCache
+from app.database.dialects import upsert, insert_ignore
+from app.database.delta import encode_delta, is_delta, apply_delta, snapshot_values
 from app.database.models import Checkpoint as CheckpointModel, CheckpointWrite as CheckpointWriteModel
 
 
@@ -20,171 +29,494 @@ from app.database.models import Checkpoint as CheckpointModel, CheckpointWrite a
 # updates. We serialize every put/put_writes for a given thread_id so that
 # only one writer touches that thread's rows at a time, and retry transient
 # DB conflicts as a safety net.
-_thread_locks: dict[str, threading.RLock] = {}
-_thread_locks_guard = threading.Lock()
+#
+# The serialization is done by ThreadLockCoordinator (app.database.locks):
+# an in-process lock per thread_id shared by the sync and async API (the
+# async API waits for it off the event loop) plus a database advisory lock,
+# so writers in other uvicorn workers or hosts are serialized too.
 
 MAX_CONCURRENCY_RETRIES = 3
 
+# ---------------------------------------------------------------------------
+# Delta checkpoints
+# ---------------------------------------------------------------------------
+# With delta storage enabled a checkpoint whose parent was written (or last
+# read) by this process is stored as a delta against it (see
+# app.database.delta), and every SNAPSHOT_INTERVAL-th checkpoint in a chain
+# is stored in full. The `type` column marks the row kind so compaction can
+# find snapshots without decoding blobs; legacy rows have type NULL and are
+# always full.
+DELTA_ENABLED = os.getenv("CHECKPOINT_DELTA_ENABLED", "true").lower() in ("1", "true", "yes")
+SNAPSHOT_INTERVAL = int(os.getenv("CHECKPOINT_SNAPSHOT_INTERVAL", "20"))
+# Number of (thread_id, checkpoint_ns) delta bases remembered in memory.
+DELTA_BASE_CACHE_SIZE = int(os.getenv("CHECKPOINT_DELTA_BASE_CACHE_SIZE", "1024"))
+
+ROW_TYPE_FULL = "full"
+ROW_TYPE_DELTA = "delta"
+# Placeholder rows created by put_writes before the checkpoint itself has
+# been put. Another worker may read the thread in between, so "latest"
+# lookups skip them until put replaces them.
+ROW_TYPE_PENDING = "pending"
+# memo key (never a checkpoint id) for ancestor rows fetched by _materialize.
+_ANCESTOR_ROWS = ("ancestor-rows",)
+
+# Columns overwritten when a row with the same primary key already exists.
+CHECKPOINT_UPDATE_COLUMNS = ("parent_checkpoint_id", "type", "checkpoint", "meta")
+WRITE_UPDATE_COLUMNS = ("channel", "type", "value")
+
+
+# ---------------------------------------------------------------------------
+# Write-behind buffering (opt-in)
+# ---------------------------------------------------------------------------
+# A chat turn with tool calls produces several put/put_writes calls, and
+# ChatService adds get_state/update_state on top. Inside
+# MySQLCheckpointSaver.buffered(thread_id) those are kept in memory and
+# written in a single transaction at the end of the turn (or earlier when a
+# size/age threshold is hit). See buffered() for the crash policy.
+WRITE_BEHIND_ENABLED = os.getenv("CHECKPOINT_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_OPS = int(os.getenv("CHECKPOINT_WRITE_BEHIND_MAX_OPS", "64"))
+WRITE_BEHIND_MAX_SECONDS = float(os.getenv("CHECKPOINT_WRITE_BEHIND_MAX_SECONDS", "5"))
+
+# ---------------------------------------------------------------------------
+# Latest-checkpoint cache
+# ---------------------------------------------------------------------------
+# get_tuple for the latest checkpoint is served from LatestCheckpointCache
+# (app.database.cache), which put keeps current. Other workers may write the
+# same thread, so by default a hit is confirmed with an index-only
+# MAX(checkpoint_id) lookup, which still skips reading and decoding the blob.
+# Single-worker deployments can turn the check off and skip the database.
+CACHE_VALIDATE = os.getenv("CHECKPOINT_CACHE_VALIDATE", "true").lower() in ("1", "true", "yes")
+
+# Rows fetched per round trip when list()/alist() stream from the server.
+LIST_BATCH_SIZE = int(os.getenv("CHECKPOINT_LIST_BATCH_SIZE", "100"))
+
+
+def _tuple_for_row(row: dict, checkpoint: Checkpoint, metadata: dict) -> CheckpointTuple:
+    """CheckpointTuple for a checkpoint row that was just encoded by put"""
+    parent_config = None
+    if row["parent_checkpoint_id"]:
+        parent_config = {
+            "configurable": {
+                "thread_id": row["thread_id"],
+                "checkpoint_ns": row["checkpoint_ns"],
+                "checkpoint_id": row["parent_checkpoint_id"]
+            }
+        }
+    return CheckpointTuple(
+        config={
+            "configurable": {
+                "thread_id": row["thread_id"],
+                "checkpoint_ns": row["checkpoint_ns"],
+                "checkpoint_id": row["checkpoint_id"]
+            }
+        },
+        checkpoint=copy_checkpoint(checkpoint),
+        metadata=metadata,
+        parent_config=parent_config
+    )
+
+
+class _TurnBuffer:
+    """Checkpoint rows and writes of one thread waiting to be flushed.
+
+    Decoded checkpoints stay readable for the whole turn, even after their
+    rows were flushed early, so readers never observe a gap between the
+    buffer being drained and the flush committing.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.closed = False
+        self.started = time.monotonic()
+        self.checkpoint_rows: dict[tuple, dict] = {}
+        self.placeholder_rows: dict[tuple, dict] = {}
+        self.write_rows: dict[tuple, dict] = {}
+        self.tuples: dict[tuple, CheckpointTuple] = {}
 
-def _lock_for(thread_id: str) -> threading.RLock:
-    with _thread_locks_guard:
-        lock = _thread_locks.get(thread_id)
-        if lock is None:
-            lock = threading.RLock()
-            _thread_locks[thread_id] = lock
-        return lock
+    def add_checkpoint(self, row: dict, checkpoint_tuple: CheckpointTuple) -> bool:
+        key = (row["checkpoint_ns"], row["checkpoint_id"])
+        with self.lock:
+            if self.closed:
+                return False
+            self.checkpoint_rows[key] = row
+            self.tuples[key] = checkpoint_tuple
+            return True
+
+    def add_writes(self, placeholder_row: dict, write_rows: list) -> bool:
+        with self.lock:
+            if self.closed:
+                return False
+            self.placeholder_rows[(placeholder_row["checkpoint_ns"], placeholder_row["checkpoint_id"])] = placeholder_row
+            for row in write_rows:
+                key = (row["checkpoint_ns"], row["checkpoint_id"], row["task_id"], row["idx"])
+                self.write_rows[key] = row
+            return True
+
+    def get(self, checkpoint_ns: str, checkpoint_id: Optional[str]) -> Optional[CheckpointTuple]:
+        with self.lock:
+            if checkpoint_id:
+                return self.tuples.get((checkpoint_ns, checkpoint_id))
+            # Everything buffered is newer than what is in the database.
+            ids = [cid for ns, cid in self.tuples if ns == checkpoint_ns]
+            return self.tuples[(checkpoint_ns, max(ids))] if ids else None
+
+    def pending(self) -> int:
+        return len(self.checkpoint_rows) + len(self.write_rows)
+
+    def age(self) -> float:
+        return time.monotonic() - self.started
+
+    def _drain_locked(self):
+        checkpoint_rows = list(self.checkpoint_rows.values())
+        placeholder_rows = [
+            row for key, row in self.placeholder_rows.items() if key not in self.checkpoint_rows
+        ]
+        write_rows = list(self.write_rows.values())
+        self.checkpoint_rows.clear()
+        self.placeholder_rows.clear()
+        self.write_rows.clear()
+        self.started = time.monotonic()
+        return checkpoint_rows, placeholder_rows, write_rows
+
+    def drain(self):
+        """Take (checkpoint_rows, placeholder_rows, write_rows) to flush"""
+        with self.lock:
+            return self._drain_locked()
+
+    def close(self):
+        """Drain for the final flush; later adds are rejected (written directly)"""
+        with self.lock:
+            self.closed = True
+            return self._drain_locked()
+
+
+def _not_pending():
+    return or_(CheckpointModel.type.is_(None), CheckpointModel.type != ROW_TYPE_PENDING)
 
 
 class MySQLCheckpointSaver(BaseCheckpointSaver):
     """SQLAlchemy-based checkpoint saver for LangGraph"""
 
-    def __init__(self):
+    def __init__(self, serde=None, compression: Optional[str] = None):
         """Initialize MySQL checkpoint saver with SQLAlchemy"""
-        super().__init__()
+        # pickle_fallback keeps arbitrary pending-write values serializable.
+        super().__init__(serde=serde or JsonPlusSerializer(pickle_fallback=True))
+        self.serializer = CheckpointSerializer(self.serde, compression)
+        # (thread_id, checkpoint_ns) -> (checkpoint_id, depth, channel_values)
+        # of the newest checkpoint this process wrote or read for that thread.
+        self._delta_bases: OrderedDict = OrderedDict()
+        self._delta_bases_guard = threading.Lock()
         self.session_factory = DatabaseConfig.get_session_factory()
+        self._async_session_factory = None
+        self.locks = ThreadLockCoordinator(DatabaseConfig.get_engine())
+        self._buffers: dict[str, _TurnBuffer] = {}
+        self._buffers_guard = threading.Lock()
+        self.latest_cache = LatestCheckpointCache()
+
+    @property
+    def async_session_factory(self):
+        # Created lazily so sync-only processes never need the async driver.
+        if self._async_session_factory is None:
+            self._async_session_factory = DatabaseConfig.get_async_session_factory()
+        return self._async_session_factory
+
+    def _locked(self, thread_id: str, fn):
+        """Wrap fn(session) so it runs and commits under the thread's
+        cross-process lock (taken on the same session/connection).
+
+        The session must be bound to a Connection (see _run/_arun): a session
+        bound to the engine hands its connection back to the pool at commit,
+        so RELEASE_LOCK would run on another connection and leave MySQL's
+        connection-scoped lock held by an idle pooled one."""
+        def _op(session):
+            with self.locks.distributed(session, thread_id):
+                result = fn(session)
+                session.commit()
+                return result
+        return _op
 
     def _run(self, thread_id: str, fn):
         """Run fn(session) with a fresh session, serialized per thread and
         retried on transient DB conflicts."""
-        lock = _lock_for(thread_id)
+        op = self._locked(thread_id, fn)
         last_exc = None
         for attempt in range(MAX_CONCURRENCY_RETRIES):
-            session = self.session_factory()
-            try:
-                with lock:
-                    result = fn(session)
-                    session.commit()
-                    return result
-            except SQLAlchemyError as e:
+            # One connection for lock, work, commit and release, checked out
+            # only once the thread's local lock is held.
+            with self.locks.held(thread_id), DatabaseConfig.get_engine().connect() as conn:
+                session = self.session_factory(bind=conn)
                 try:
-                    session.rollback()
-                except Exception:
-                    pass
-                last_exc = e
-                # Briefly back off and retry the whole read-modify-write.
-                time.sleep(0.05 * (attempt + 1))
-                continue
-            finally:
-                session.close()
+                    return op(session)
+                except SQLAlchemyError as e:
+                    try:
+                        session.rollback()
+                    except Exception:
+                        pass
+                    last_exc = e
+                finally:
+                    session.close()
+            # Briefly back off and retry the whole read-modify-write.
+            time.sleep(0.05 * (attempt + 1))
         raise last_exc
 
-    def put(self, config: dict, checkpoint: Checkpoint, metadata: dict, new_versions: dict) -> dict:
-        """Save a checkpoint to MySQL using SQLAlchemy"""
+    async def _arun(self, thread_id: str, fn):
+        """Async counterpart of _run: run fn(session) on the async driver via
+        AsyncSession.run_sync, serialized per thread with the sync writers."""
+        op = self._locked(thread_id, fn)
+        last_exc = None
+        for attempt in range(MAX_CONCURRENCY_RETRIES):
+            async with self.locks.aheld(thread_id):
+                async with DatabaseConfig.get_async_engine().connect() as conn:
+                    async with self.async_session_factory(bind=conn) as session:
+                        try:
+                            return await session.run_sync(op)
+                        except SQLAlchemyError as e:
+                            try:
+                                await session.rollback()
+                            except Exception:
+                                pass
+                            last_exc = e
+            await asyncio.sleep(0.05 * (attempt + 1))
+        raise last_exc
+
+    def _delta_base(self, key: tuple, parent_id: Optional[str]):
+        if not DELTA_ENABLED or not parent_id:
+            return None
+        with self._delta_bases_guard:
+            base = self._delta_bases.get(key)
+            if base is not None:
+                self._delta_bases.move_to_end(key)
+        if base is None or base[0] != parent_id:
+            return None
+        return base
+
+    def _remember_base(self, key: tuple, checkpoint_id: str, depth: int, channel_values: dict) -> None:
+        if not DELTA_ENABLED:
+            return
+        with self._delta_bases_guard:
+            current = self._delta_bases.get(key)
+            # Never move a thread's base backwards (e.g. when reading history).
+            if current is not None and current[0] > checkpoint_id:
+                return
+            self._delta_bases[key] = (checkpoint_id, depth, snapshot_values(channel_values))
+            self._delta_bases.move_to_end(key)
+            while len(self._delta_bases) > DELTA_BASE_CACHE_SIZE:
+                self._delta_bases.popitem(last=False)
+
+    def _encode_checkpoint(self, key: tuple, checkpoint: Checkpoint, parent_id: Optional[str]):
+        """Return (row_type, blob, depth) for a checkpoint, as a delta if possible"""
+        base = self._delta_base(key, parent_id)
+        if base is not None and base[1] + 1 < SNAPSHOT_INTERVAL:
+            depth = base[1] + 1
+            payload = encode_delta(checkpoint, parent_id, base[2], depth)
+            return ROW_TYPE_DELTA, self.serializer.dumps(payload), depth
+        return ROW_TYPE_FULL, self.serializer.dumps(checkpoint), 0
+
+    def _checkpoint_row(self, config: dict, checkpoint: Checkpoint, metadata: dict):
+        """Encode a checkpoint into a row dict for the checkpoints table.
+
+        Returns (thread_id, delta key, row, depth, saved config).
+        """
         thread_id = config["configurable"]["thread_id"]
         checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
         checkpoint_id = checkpoint["id"]
-        parent_checkpoint_id = checkpoint.get("parent_id")
-
-        def _op(session):
-            checkpoint_blob = pickle.dumps(checkpoint)
-            metadata_blob = pickle.dumps(metadata)
+        # The incoming config points at the checkpoint this one was created from.
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        key = (thread_id, checkpoint_ns)
 
-            existing = session.query(CheckpointModel).filter_by(
-                thread_id=thread_id,
-                checkpoint_ns=checkpoint_ns,
-                checkpoint_id=checkpoint_id
-            ).first()
-
-            if existing:
-                existing.parent_checkpoint_id = parent_checkpoint_id
-                existing.type = checkpoint.get("type")
-                existing.checkpoint = checkpoint_blob
-                existing.meta = metadata_blob
-            else:
-                session.add(CheckpointModel(
-                    thread_id=thread_id,
-                    checkpoint_ns=checkpoint_ns,
-                    checkpoint_id=checkpoint_id,
-                    parent_checkpoint_id=parent_checkpoint_id,
-                    type=checkpoint.get("type"),
-                    checkpoint=checkpoint_blob,
-                    meta=metadata_blob
-                ))
-
-            return {
-                "configurable": {
-                    "thread_id": thread_id,
-                    "checkpoint_ns": checkpoint_ns,
-                    "checkpoint_id": checkpoint_id
-                }
+        row_type, checkpoint_blob, depth = self._encode_checkpoint(key, checkpoint, parent_checkpoint_id)
+        row = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+            "parent_checkpoint_id": parent_checkpoint_id,
+            "type": row_type,
+            "checkpoint": checkpoint_blob,
+            "meta": self.serializer.dumps(metadata)
+        }
+        saved_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id
             }
+        }
+        return thread_id, key, row, depth, saved_config
 
-        return self._run(thread_id, _op)
-
-    def put_writes(self, config: dict, writes: list, task_id: str) -> None:
-        """Save checkpoint writes to MySQL using SQLAlchemy"""
+    def _write_rows(self, config: dict, writes: list, task_id: str):
+        """Encode pending writes into rows, plus the placeholder checkpoint row
+        they need if the checkpoint itself has not been put yet."""
         thread_id = config["configurable"]["thread_id"]
         checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
         checkpoint_id = config["configurable"]["checkpoint_id"]
 
+        placeholder_checkpoint = {
+            "id": checkpoint_id,
+            "v": 1,
+            "ts": "",
+            "channel_values": {},
+            "channel_versions": {},
+            "versions_seen": {}
+        }
+        placeholder_row = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+            "parent_checkpoint_id": None,
+            "type": ROW_TYPE_PENDING,
+            "checkpoint": self.serializer.dumps(placeholder_checkpoint),
+            "meta": self.serializer.dumps({})
+        }
+        write_rows = [
+            {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "idx": idx,
+                "channel": channel,
+                "type": type(value).__name__,
+                "value": self.serializer.dumps(value)
+            }
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        return thread_id, placeholder_row, write_rows
+
+    @staticmethod
+    def _write_op(checkpoint_rows: list, placeholder_rows: list, write_rows: list):
         def _op(session):
-            # Ensure checkpoint exists before adding writes (to satisfy the
-            # foreign key constraint). LangGraph may call put_writes before
-            # put, so create a placeholder if needed.
-            checkpoint_exists = session.query(CheckpointModel).filter_by(
-                thread_id=thread_id,
-                checkpoint_ns=checkpoint_ns,
-                checkpoint_id=checkpoint_id
-            ).first()
+            # Checkpoint upserts also replace placeholders left by put_writes.
+            upsert(session, CheckpointModel, checkpoint_rows, CHECKPOINT_UPDATE_COLUMNS)
+            # Writes need their checkpoint row to exist (foreign key), and
+            # LangGraph may call put_writes before put: create placeholders,
+            # leaving any existing row untouched.
+            insert_ignore(session, CheckpointModel, placeholder_rows)
+            upsert(session, CheckpointWriteModel, write_rows, WRITE_UPDATE_COLUMNS)
+        return _op
 
-            if not checkpoint_exists:
-                placeholder_checkpoint = {
-                    "id": checkpoint_id,
-                    "v": 1,
-                    "ts": "",
-                    "channel_values": {},
-                    "channel_versions": {},
-                    "versions_seen": {}
-                }
-                session.add(CheckpointModel(
-                    thread_id=thread_id,
-                    checkpoint_ns=checkpoint_ns,
-                    checkpoint_id=checkpoint_id,
-                    parent_checkpoint_id=None,
-                    type=None,
-                    checkpoint=pickle.dumps(placeholder_checkpoint),
-                    meta=pickle.dumps({})
-                ))
-                session.flush()
-
-            # Use no_autoflush to prevent premature flush during queries.
-            with session.no_autoflush:
-                for idx, (channel, value) in enumerate(writes):
-                    value_blob = pickle.dumps(value)
-
-                    existing = session.query(CheckpointWriteModel).filter_by(
-                        thread_id=thread_id,
-                        checkpoint_ns=checkpoint_ns,
-                        checkpoint_id=checkpoint_id,
-                        task_id=task_id,
-                        idx=idx
-                    ).first()
-
-                    if existing:
-                        existing.type = type(value).__name__
-                        existing.value = value_blob
-                    else:
-                        session.add(CheckpointWriteModel(
-                            thread_id=thread_id,
-                            checkpoint_ns=checkpoint_ns,
-                            checkpoint_id=checkpoint_id,
-                            task_id=task_id,
-                            idx=idx,
-                            channel=channel,
-                            type=type(value).__name__,
-                            value=value_blob
-                        ))
-
-        self._run(thread_id, _op)
+    # -- write-behind buffering ---------------------------------------------
 
-    def get_tuple(self, config: dict) -> Optional[CheckpointTuple]:
-        """Get a checkpoint tuple from MySQL using SQLAlchemy"""
+    def _buffer_for(self, thread_id: str) -> Optional[_TurnBuffer]:
+        with self._buffers_guard:
+            return self._buffers.get(thread_id)
+
+    def _open_buffer(self, thread_id: str) -> Optional[_TurnBuffer]:
+        """Install a turn buffer for thread_id; None if one is already open"""
+        with self._buffers_guard:
+            if thread_id in self._buffers:
+                return None
+            buffer = self._buffers[thread_id] = _TurnBuffer()
+            return buffer
+
+    def _close_buffer(self, thread_id: str, buffer: _TurnBuffer) -> None:
+        with self._buffers_guard:
+            if self._buffers.get(thread_id) is buffer:
+                del self._buffers[thread_id]
+
+    def _write_drained(self, thread_id: str, rows) -> None:
+        """Write rows taken out of a turn buffer.
+
+        Once drained they exist nowhere else, so if the write fails the
+        delta bases remembered for them point at checkpoints that were never
+        stored: forget the thread so the next put writes a full snapshot.
+        """
+        try:
+            self._run(thread_id, self._write_op(*rows))
+        except Exception:
+            self._forget_thread(thread_id)
+            raise
+
+    async def _awrite_drained(self, thread_id: str, rows) -> None:
+        try:
+            await self._arun(thread_id, self._write_op(*rows))
+        except Exception:
+            self._forget_thread(thread_id)
+            raise
+
+    def _buffered_tuple(self, config: dict) -> Optional[CheckpointTuple]:
+        buffer = self._buffer_for(config["configurable"]["thread_id"])
+        if buffer is None:
+            return None
+        return buffer.get(
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"].get("checkpoint_id")
+        )
+
+    def _take_if_due(self, buffer: _TurnBuffer):
+        if buffer.pending() >= WRITE_BEHIND_MAX_OPS or buffer.age() >= WRITE_BEHIND_MAX_SECONDS:
+            return buffer.drain()
+        return None
+
+    def _forget_thread(self, thread_id: str) -> None:
+        """Drop in-memory state derived from a thread (delta bases, cache)"""
+        with self._delta_bases_guard:
+            for key in [k for k in self._delta_bases if k[0] == thread_id]:
+                del self._delta_bases[key]
+        self.latest_cache.invalidate(thread_id)
+
+    def invalidate(self, thread_id: str) -> None:
+        """Forget everything cached for thread_id (call after deleting or
+        rewriting its rows outside the saver)"""
+        self._forget_thread(thread_id)
+
+    def stats(self) -> dict:
+        return {"latest_cache": self.latest_cache.stats(), "locks": self.locks.stats()}
+
+    @contextmanager
+    def buffered(self, thread_id: str):
+        """Hold this thread's checkpoint writes in memory for one turn.
+
+        While the block runs, put/put_writes for thread_id are kept in memory
+        (and served to get_tuple from there) and written in one transaction
+        when the block exits, or earlier once WRITE_BEHIND_MAX_OPS writes or
+        WRITE_BEHIND_MAX_SECONDS have accumulated. The block is flushed on
+        exit even when it raises, so a failed turn persists exactly what an
+        unbuffered run would have. If the process dies mid-turn, the
+        unflushed supersteps of that turn are lost and the thread resumes
+        from its last flushed checkpoint (the user re-sends the message).
+
+        No-op unless CHECKPOINT_WRITE_BEHIND is enabled; nested or
+        concurrent use for the same thread joins the block already open.
+        """
+        buffer = self._open_buffer(thread_id) if WRITE_BEHIND_ENABLED else None
+        if buffer is None:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            try:
+                rows = buffer.close()
+                if any(rows):
+                    self._write_drained(thread_id, rows)
+            finally:
+                self._close_buffer(thread_id, buffer)
+
+    @asynccontextmanager
+    async def abuffered(self, thread_id: str):
+        """Async counterpart of buffered()"""
+        buffer = self._open_buffer(thread_id) if WRITE_BEHIND_ENABLED else None
+        if buffer is None:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            try:
+                rows = buffer.close()
+                if any(rows):
+                    await self._awrite_drained(thread_id, rows)
+            finally:
+                self._close_buffer(thread_id, buffer)
+
+    def _get_tuple_op(self, config: dict):
         thread_id = config["configurable"]["thread_id"]
         checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
         checkpoint_id = config["configurable"].get("checkpoint_id")
 
-        session = self.session_factory()
-        try:
+        def _op(session):
             if checkpoint_id:
                 result = session.query(CheckpointModel).filter_by(
                     thread_id=thread_id,
@@ -195,25 +527,339 @@ class MySQLCheckpointSaver(BaseCheckpointSaver):
                 result = session.query(CheckpointModel).filter_by(
                     thread_id=thread_id,
                     checkpoint_ns=checkpoint_ns
+                ).filter(
+                    _not_pending()
                 ).order_by(CheckpointModel.checkpoint_id.desc()).first()
 
             if result:
-                checkpoint = pickle.loads(result.checkpoint)
-                metadata = pickle.loads(result.meta)
-                config_with_id = {
+                checkpoint_tuple, depth = self._row_to_tuple(session, result, with_depth=True)
+                if not checkpoint_id:
+                    # The latest checkpoint is what the next put will extend.
+                    self._remember_base(
+                        (thread_id, checkpoint_ns),
+                        result.checkpoint_id,
+                        depth,
+                        checkpoint_tuple.checkpoint["channel_values"]
+                    )
+                    self.latest_cache.put((thread_id, checkpoint_ns), checkpoint_tuple)
+                return checkpoint_tuple
+            return None
+
+        return _op
+
+    @staticmethod
+    def _latest_id_op(thread_id: str, checkpoint_ns: str):
+        def _op(session):
+            return session.query(func.max(CheckpointModel.checkpoint_id)).filter(
+                CheckpointModel.thread_id == thread_id,
+                CheckpointModel.checkpoint_ns == checkpoint_ns,
+                _not_pending()
+            ).scalar()
+        return _op
+
+    def _cache_lookup(self, config: dict):
+        """Classify a get_tuple config for the latest cache.
+
+        Returns (key, cached tuple, needs_check). A lookup by checkpoint id
+        hits only if that exact checkpoint is cached, and needs no check
+        since a checkpoint never changes once written. A "latest" lookup
+        needs the MAX(checkpoint_id) check when CACHE_VALIDATE is on.
+        """
+        if not self.latest_cache.enabled:
+            return None, None, False
+        key = (config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", ""))
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        if checkpoint_id:
+            if checkpoint_id != self.latest_cache.peek_id(key):
+                return None, None, False
+            return key, self.latest_cache.get(key, checkpoint_id), False
+        if CACHE_VALIDATE:
+            return key, None, True
+        return key, self.latest_cache.get(key), False
+
+    def _validated_latest(self, key: tuple, latest_id: Optional[str]) -> Optional[CheckpointTuple]:
+        if latest_id is None:
+            self.latest_cache.discard(key)
+            return None
+        # A different id means another worker moved the thread on.
+        return self.latest_cache.get(key, latest_id)
+
+    def _list_query(
+        self,
+        config: Optional[dict],
+        before: Optional[dict] = None,
+        limit: Optional[int] = None,
+        with_meta: bool = True,
+        with_checkpoint: bool = True
+    ):
+        """Select the rows list() covers, reading only the blob columns needed"""
+        columns = [
+            CheckpointModel.thread_id,
+            CheckpointModel.checkpoint_ns,
+            CheckpointModel.checkpoint_id,
+            CheckpointModel.parent_checkpoint_id,
+            CheckpointModel.type
+        ]
+        if with_meta:
+            columns.append(CheckpointModel.meta)
+        if with_checkpoint:
+            columns.append(CheckpointModel.checkpoint)
+        query = select(*columns).where(_not_pending())
+
+        configurable = (config or {}).get("configurable", {})
+        if "thread_id" in configurable:
+            query = query.where(
+                CheckpointModel.thread_id == configurable["thread_id"],
+                CheckpointModel.checkpoint_ns == configurable.get("checkpoint_ns", "")
+            )
+            if configurable.get("checkpoint_id"):
+                query = query.where(CheckpointModel.checkpoint_id == configurable["checkpoint_id"])
+            query = query.order_by(CheckpointModel.checkpoint_id.desc())
+        else:
+            query = query.order_by(
+                CheckpointModel.thread_id,
+                CheckpointModel.checkpoint_ns,
+                CheckpointModel.checkpoint_id.desc()
+            )
+        if before and before.get("configurable", {}).get("checkpoint_id"):
+            query = query.where(CheckpointModel.checkpoint_id < before["configurable"]["checkpoint_id"])
+        if limit is not None:
+            query = query.limit(limit)
+        return query.execution_options(yield_per=LIST_BATCH_SIZE)
+
+    def _list_item(self, session, row, filter: Optional[dict], projection: bool, memo: dict):
+        """Turn a listed row into a CheckpointTuple, or None if filter rejects it.
+
+        session is only used (to fetch the checkpoint blob and delta
+        ancestors) when projection is off.
+        """
+        metadata = None
+        if filter:
+            metadata = self.serializer.loads(row.meta)
+            if any(metadata.get(k) != v for k, v in filter.items()):
+                return None
+        if projection:
+            return CheckpointTuple(
+                config={
                     "configurable": {
-                        "thread_id": thread_id,
-                        "checkpoint_ns": checkpoint_ns,
-                        "checkpoint_id": checkpoint["id"] if not checkpoint_id else checkpoint_id
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.checkpoint_id
                     }
-                }
-                return CheckpointTuple(
-                    config=config_with_id,
-                    checkpoint=checkpoint,
-                    metadata=metadata,
-                    parent_config=None
+                },
+                checkpoint=None,
+                metadata=metadata,
+                parent_config={
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id
+                    }
+                } if row.parent_checkpoint_id else None
+            )
+        if filter:
+            # Only rows that passed the filter pay for the checkpoint blob.
+            blob = session.query(CheckpointModel.checkpoint).filter_by(
+                thread_id=row.thread_id,
+                checkpoint_ns=row.checkpoint_ns,
+                checkpoint_id=row.checkpoint_id
+            ).scalar()
+            return self._row_to_tuple(session, row, memo, blob=blob, metadata=metadata)
+        return self._row_to_tuple(session, row, memo)
+
+    @staticmethod
+    def _list_memo(memo: dict, row, current: list) -> None:
+        # Rebuilt channel values only help rows of the same thread/namespace;
+        # dropping them on change keeps a full-table scan at O(thread) memory.
+        key = (row.thread_id, row.checkpoint_ns)
+        if current and current[0] != key:
+            memo.clear()
+        current[:] = [key]
+
+    def _materialize(self, session, row, payload, memo: Optional[dict] = None) -> dict:
+        """Rebuild the full checkpoint for a delta row.
+
+        Walks parent pointers back to the nearest full snapshot (or an
+        ancestor already rebuilt in ``memo``) and replays the deltas forward.
+        Ancestors are fetched by range, from the nearest snapshot up to the
+        missing ancestor, and kept in ``memo`` with the rebuilt channel values,
+        so a listing reads each row at most once.
+        """
+        memo = memo if memo is not None else {}
+        chain = [(row.checkpoint_id, payload)]
+        base_id = payload["base"]
+        base_values = None
+        while True:
+            if base_id in memo:
+                base_values = memo[base_id]
+                break
+            base_row = self._ancestor_row(session, row, base_id, memo)
+            if base_row is None:
+                raise LookupError(
+                    f"Delta base checkpoint {base_id} missing for thread {row.thread_id}"
                 )
-            return None
+            base_payload = self.serializer.loads(base_row.checkpoint)
+            if is_delta(base_payload):
+                chain.append((base_id, base_payload))
+                base_id = base_payload["base"]
+                continue
+            base_values = base_payload["channel_values"]
+            memo[base_id] = base_values
+            break
+
+        checkpoint = None
+        for checkpoint_id, delta in reversed(chain):
+            checkpoint = apply_delta(delta, base_values)
+            base_values = checkpoint["channel_values"]
+            memo[checkpoint_id] = base_values
+        return checkpoint
+
+    @staticmethod
+    def _ancestor_row(session, row, checkpoint_id: str, memo: dict):
+        """Row checkpoint_id of row's thread/namespace, fetched with the rows
+        back to its nearest snapshot (pending placeholders are not snapshots)"""
+        window = memo.setdefault(_ANCESTOR_ROWS, {})
+        if checkpoint_id in window:
+            return window[checkpoint_id]
+        same_thread = (
+            CheckpointModel.thread_id == row.thread_id,
+            CheckpointModel.checkpoint_ns == row.checkpoint_ns,
+        )
+        nearest_snapshot = select(func.max(CheckpointModel.checkpoint_id)).where(
+            *same_thread,
+            CheckpointModel.checkpoint_id <= checkpoint_id,
+            or_(
+                CheckpointModel.type.is_(None),
+                CheckpointModel.type.notin_((ROW_TYPE_DELTA, ROW_TYPE_PENDING))
+            )
+        ).scalar_subquery()
+        for ancestor in session.query(CheckpointModel).filter(
+            *same_thread,
+            CheckpointModel.checkpoint_id >= nearest_snapshot,
+            CheckpointModel.checkpoint_id <= checkpoint_id
+        ):
+            window[ancestor.checkpoint_id] = ancestor
+        if checkpoint_id not in window:
+            # No snapshot below it (e.g. compacted): fetch it alone.
+            window[checkpoint_id] = session.query(CheckpointModel).filter_by(
+                thread_id=row.thread_id,
+                checkpoint_ns=row.checkpoint_ns,
+                checkpoint_id=checkpoint_id
+            ).first()
+        return window[checkpoint_id]
+
+    def _row_to_tuple(
+        self,
+        session,
+        row,
+        memo: Optional[dict] = None,
+        with_depth: bool = False,
+        blob: Optional[bytes] = None,
+        metadata: Optional[dict] = None
+    ):
+        """Decode a checkpoints row; blob/metadata override columns the
+        row was selected without (or were already decoded)"""
+        payload = self.serializer.loads(blob if blob is not None else row.checkpoint)
+        depth = 0
+        if is_delta(payload):
+            depth = payload["depth"]
+            checkpoint = self._materialize(session, row, payload, memo)
+        else:
+            checkpoint = payload
+        if metadata is None:
+            metadata = self.serializer.loads(row.meta)
+        config_dict = {
+            "configurable": {
+                "thread_id": row.thread_id,
+                "checkpoint_ns": row.checkpoint_ns,
+                "checkpoint_id": row.checkpoint_id
+            }
+        }
+        parent_config = None
+        if row.parent_checkpoint_id:
+            parent_config = {
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.parent_checkpoint_id
+                }
+            }
+        checkpoint_tuple = CheckpointTuple(
+            config=config_dict,
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=parent_config
+        )
+        return (checkpoint_tuple, depth) if with_depth else checkpoint_tuple
+
+    def _drain_buffers(self, config: Optional[dict]):
+        """Take the pending rows of the buffers a listing of config covers"""
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        with self._buffers_guard:
+            buffers = (
+                [(thread_id, self._buffers[thread_id])] if thread_id in self._buffers
+                else [] if thread_id else list(self._buffers.items())
+            )
+        drained = []
+        for tid, buffer in buffers:
+            rows = buffer.drain()
+            if any(rows):
+                drained.append((tid, rows))
+        return drained
+
+    def _flush_buffers(self, config: Optional[dict]) -> None:
+        # list() reads straight from the database, so buffered rows it
+        # covers are flushed first.
+        for thread_id, rows in self._drain_buffers(config):
+            self._write_drained(thread_id, rows)
+
+    # -- sync API -----------------------------------------------------------
+
+    def put(self, config: dict, checkpoint: Checkpoint, metadata: dict, new_versions: dict) -> dict:
+        """Save a checkpoint to MySQL using SQLAlchemy"""
+        thread_id, key, row, depth, saved_config = self._checkpoint_row(config, checkpoint, metadata)
+        checkpoint_tuple = _tuple_for_row(row, checkpoint, metadata)
+        try:
+            buffer = self._buffer_for(thread_id)
+            if buffer is not None and buffer.add_checkpoint(row, checkpoint_tuple):
+                due = self._take_if_due(buffer)
+                if due:
+                    self._write_drained(thread_id, due)
+            else:
+                self._run(thread_id, self._write_op([row], [], []))
+        except Exception:
+            self.latest_cache.discard(key)
+            raise
+        self._remember_base(key, checkpoint["id"], depth, checkpoint["channel_values"])
+        self.latest_cache.put(key, checkpoint_tuple)
+        return saved_config
+
+    def put_writes(self, config: dict, writes: list, task_id: str, task_path: str = "") -> None:
+        """Save checkpoint writes to MySQL using SQLAlchemy"""
+        thread_id, placeholder_row, write_rows = self._write_rows(config, writes, task_id)
+        buffer = self._buffer_for(thread_id)
+        if buffer is not None and buffer.add_writes(placeholder_row, write_rows):
+            due = self._take_if_due(buffer)
+            if due:
+                self._write_drained(thread_id, due)
+            return
+        self._run(thread_id, self._write_op([], [placeholder_row], write_rows))
+
+    def get_tuple(self, config: dict) -> Optional[CheckpointTuple]:
+        """Get a checkpoint tuple from MySQL using SQLAlchemy"""
+        buffered = self._buffered_tuple(config)
+        if buffered is not None:
+            return buffered
+        key, cached, needs_check = self._cache_lookup(config)
+        if cached is not None:
+            return cached
+        session = self.session_factory()
+        try:
+            if needs_check:
+                cached = self._validated_latest(key, self._latest_id_op(*key)(session))
+                if cached is not None:
+                    return cached
+            return self._get_tuple_op(config)(session)
         finally:
             session.close()
 
@@ -224,40 +870,145 @@ class MySQLCheckpointSaver(BaseCheckpointSaver):
             return result[1]  # Return just the checkpoint
         return None
 
-    def list(self, config: Optional[dict] = None) -> Iterator[CheckpointTuple]:
-        """List all checkpoints, optionally filtered by config"""
+    def list(
+        self,
+        config: Optional[dict] = None,
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[dict] = None,
+        limit: Optional[int] = None,
+        projection: bool = False
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints newest first, optionally filtered by config.
+
+        before and limit are applied in SQL (limit after filter when one is
+        given, since metadata is only readable once decoded) and rows are
+        streamed from a server-side cursor. With projection=True only the
+        id columns are read: tuples carry configs and parent configs, with
+        checkpoint None and metadata None (or the decoded metadata when a
+        filter needed it).
+        """
+        if limit is not None and limit <= 0:
+            return
+        self._flush_buffers(config)
+        query = self._list_query(
+            config,
+            before=before,
+            limit=None if filter else limit,
+            with_meta=bool(filter) or not projection,
+            with_checkpoint=not (filter or projection)
+        )
         session = self.session_factory()
+        # Delta rows need ancestor lookups, which cannot share the connection
+        # that is still streaming the listing.
+        aux = self.session_factory()
         try:
-            query = session.query(CheckpointModel)
+            memo, current, count = {}, [], 0
+            for row in session.execute(query):
+                self._list_memo(memo, row, current)
+                checkpoint_tuple = self._list_item(aux, row, filter, projection, memo)
+                if checkpoint_tuple is None:
+                    continue
+                yield checkpoint_tuple
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            aux.close()
+            session.close()
 
-            if config and "thread_id" in config.get("configurable", {}):
-                thread_id = config["configurable"]["thread_id"]
-                checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
-                query = query.filter_by(
-                    thread_id=thread_id,
-                    checkpoint_ns=checkpoint_ns
-                ).order_by(CheckpointModel.checkpoint_id.desc())
+    # -- async API ----------------------------------------------------------
+    # Same operations as above, executed on the async driver so graphs driven
+    # with astream/ainvoke never block the event loop on database I/O.
+
+    async def aput(self, config: dict, checkpoint: Checkpoint, metadata: dict, new_versions: dict) -> dict:
+        """Save a checkpoint asynchronously"""
+        thread_id, key, row, depth, saved_config = self._checkpoint_row(config, checkpoint, metadata)
+        checkpoint_tuple = _tuple_for_row(row, checkpoint, metadata)
+        try:
+            buffer = self._buffer_for(thread_id)
+            if buffer is not None and buffer.add_checkpoint(row, checkpoint_tuple):
+                due = self._take_if_due(buffer)
+                if due:
+                    await self._awrite_drained(thread_id, due)
             else:
-                query = query.order_by(
-                    CheckpointModel.thread_id,
-                    CheckpointModel.checkpoint_id.desc()
-                )
+                await self._arun(thread_id, self._write_op([row], [], []))
+        except Exception:
+            self.latest_cache.discard(key)
+            raise
+        self._remember_base(key, checkpoint["id"], depth, checkpoint["channel_values"])
+        self.latest_cache.put(key, checkpoint_tuple)
+        return saved_config
 
-            for result in query:
-                checkpoint = pickle.loads(result.checkpoint)
-                metadata = pickle.loads(result.meta)
-                config_dict = {
-                    "configurable": {
-                        "thread_id": result.thread_id,
-                        "checkpoint_ns": result.checkpoint_ns,
-                        "checkpoint_id": result.checkpoint_id
-                    }
-                }
-                yield CheckpointTuple(
-                    config=config_dict,
-                    checkpoint=checkpoint,
-                    metadata=metadata,
-                    parent_config=None
-                )
-        finally:
-            session.close()
+    async def aput_writes(self, config: dict, writes: list, task_id: str, task_path: str = "") -> None:
+        """Save checkpoint writes asynchronously"""
+        thread_id, placeholder_row, write_rows = self._write_rows(config, writes, task_id)
+        buffer = self._buffer_for(thread_id)
+        if buffer is not None and buffer.add_writes(placeholder_row, write_rows):
+            due = self._take_if_due(buffer)
+            if due:
+                await self._awrite_drained(thread_id, due)
+            return
+        await self._arun(thread_id, self._write_op([], [placeholder_row], write_rows))
+
+    async def aget_tuple(self, config: dict) -> Optional[CheckpointTuple]:
+        """Get a checkpoint tuple asynchronously"""
+        buffered = self._buffered_tuple(config)
+        if buffered is not None:
+            return buffered
+        key, cached, needs_check = self._cache_lookup(config)
+        if cached is not None:
+            return cached
+        async with self.async_session_factory() as session:
+            if needs_check:
+                latest_id = await session.run_sync(self._latest_id_op(*key))
+                cached = self._validated_latest(key, latest_id)
+                if cached is not None:
+                    return cached
+            return await session.run_sync(self._get_tuple_op(config))
+
+    async def aget(self, config: dict) -> Optional[Checkpoint]:
+        """Get a checkpoint asynchronously (convenience method)"""
+        result = await self.aget_tuple(config)
+        if result:
+            return result[1]
+        return None
+
+    async def alist(
+        self,
+        config: Optional[dict] = None,
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[dict] = None,
+        limit: Optional[int] = None,
+        projection: bool = False
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Async counterpart of list(), streaming rows from the driver"""
+        if limit is not None and limit <= 0:
+            return
+        for thread_id, rows in self._drain_buffers(config):
+            await self._awrite_drained(thread_id, rows)
+        query = self._list_query(
+            config,
+            before=before,
+            limit=None if filter else limit,
+            with_meta=bool(filter) or not projection,
+            with_checkpoint=not (filter or projection)
+        )
+        memo, current, count = {}, [], 0
+        async with self.async_session_factory() as session, self.async_session_factory() as aux:
+            result = await session.stream(query)
+            async for row in result:
+                self._list_memo(memo, row, current)
+                if projection:
+                    checkpoint_tuple = self._list_item(None, row, filter, projection, memo)
+                else:
+                    checkpoint_tuple = await aux.run_sync(
+                        lambda s, r=row: self._list_item(s, r, filter, projection, memo)
+                    )
+                if checkpoint_tuple is None:
+                    continue
+                yield checkpoint_tuple
+                count += 1
+                if limit is not None and count >= limit:
+                    break
@@ -0,0 +1,121 @@
+"""Instrumented connection pools
+
+SQLAlchemy's QueuePool blocks a request when all pool_size + max_overflow
+connections are checked out, but nothing records how long requests waited.
+The pools below time every checkout and count connect failures and
+checkout timeouts, so /api/health/details can show whether the pool is
+sized right.
+"""
+import bisect
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Upper bounds (milliseconds) of the checkout wait histogram buckets.
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolMetrics:
+    """Checkout wait histogram and error counters of one pool"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connect_errors = 0
+        self.last_connect_error = None
+
+    def record_wait(self, seconds: float) -> None:
+        with self._guard:
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self) -> None:
+        with self._guard:
+            self.timeouts += 1
+
+    def record_connect_error(self, error: Exception) -> None:
+        with self._guard:
+            self.connect_errors += 1
+            self.last_connect_error = f"{type(error).__name__}: {error}"
+
+    def snapshot(self) -> dict:
+        with self._guard:
+            labels = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + ["gt_5000ms"]
+            return {
+                "checkouts": self.checkouts,
+                "wait_ms_avg": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+                "wait_histogram": dict(zip(labels, self.buckets)),
+                "timeouts": self.timeouts,
+                "connect_errors": self.connect_errors,
+                "last_connect_error": self.last_connect_error,
+            }
+
+
+class _InstrumentedPoolMixin:
+    def __init__(self, *args, metrics: PoolMetrics = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics or PoolMetrics()
+        creator = self._invoke_creator
+
+        # Every new DBAPI connection (first connect or reconnect after an
+        # invalidation) goes through _invoke_creator.
+        def _invoke_creator(record):
+            try:
+                return creator(record)
+            except Exception as e:
+                self.metrics.record_connect_error(e)
+                raise
+
+        self._invoke_creator = _invoke_creator
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+        self.metrics.record_wait(time.perf_counter() - started)
+        return record
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep the counters.
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    """QueuePool that records checkout waits and connect errors"""
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout waits and connect errors"""
+
+
+def pool_status(engine) -> dict:
+    """Live occupancy plus recorded metrics of an engine's pool"""
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(metrics.snapshot())
+    return status
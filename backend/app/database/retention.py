@@ -0,0 +1,252 @@
+"""Checkpoint retention and background compaction
+
+LangGraph only ever reads the latest checkpoint of a thread plus a few
+recent ancestors (edit/regenerate), but every superstep adds a row to
+``checkpoints`` and ``checkpoint_writes``. The compactor enforces a retention
+policy per (thread_id, checkpoint_ns):
+
+- the newest KEEP_LAST checkpoints are always kept,
+- checkpoints newer than KEEP_SECONDS are always kept,
+- every full snapshot a kept delta checkpoint is rebuilt from is kept.
+
+Everything older is deleted in small batches, each in its own short
+transaction, so no long-running lock is ever held on the tables.
+
+Run once from the command line with ``python -m app.database.retention``.
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import func, tuple_
+
+from app.database.config import DatabaseConfig
+from app.database.models import Checkpoint as CheckpointModel, CheckpointWrite as CheckpointWriteModel
+from app.database.mysql_checkpoint import ROW_TYPE_DELTA
+
+# Offset between the UUID epoch (1582-10-15) and the Unix epoch, in 100ns.
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_id_at(timestamp: float) -> str:
+    """Smallest checkpoint id that LangGraph could generate at timestamp.
+
+    LangGraph checkpoint ids are UUIDv6, whose string form sorts by creation
+    time. Comparing against this id turns "older than T" into an index range
+    on the checkpoints primary key.
+    """
+    ticks = int(timestamp * 10_000_000) + _UUID_EPOCH_OFFSET
+    hex_ts = f"{ticks & ((1 << 60) - 1):015x}"
+    return f"{hex_ts[:8]}-{hex_ts[8:12]}-6{hex_ts[12:]}-0000-000000000000"
+
+
+class CheckpointCompactor:
+    """Deletes checkpoints outside the retention policy in bounded batches"""
+
+    KEEP_LAST = int(os.getenv("CHECKPOINT_RETENTION_KEEP_LAST", "50"))
+    # 0 disables the age rule (only KEEP_LAST applies).
+    KEEP_SECONDS = int(os.getenv("CHECKPOINT_RETENTION_KEEP_SECONDS", str(7 * 24 * 3600)))
+    BATCH_SIZE = int(os.getenv("CHECKPOINT_COMPACTION_BATCH_SIZE", "500"))
+    # Seconds between background runs; 0 disables the background job.
+    INTERVAL_SECONDS = int(os.getenv("CHECKPOINT_COMPACTION_INTERVAL", "0"))
+    THREAD_PAGE_SIZE = 500
+
+    def __init__(
+        self,
+        keep_last: Optional[int] = None,
+        keep_seconds: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.keep_last = max(1, keep_last if keep_last is not None else self.KEEP_LAST)
+        self.keep_seconds = keep_seconds if keep_seconds is not None else self.KEEP_SECONDS
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.session_factory = DatabaseConfig.get_session_factory()
+        self.last_report: Optional[dict] = None
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    # -- policy ---------------------------------------------------------------
+
+    def _cutoff_id(self, session, thread_id: str, checkpoint_ns: str) -> Optional[str]:
+        """Checkpoint id below which rows of this thread may be deleted"""
+        same_thread = (
+            CheckpointModel.thread_id == thread_id,
+            CheckpointModel.checkpoint_ns == checkpoint_ns,
+        )
+        nth_newest = session.query(CheckpointModel.checkpoint_id).filter(*same_thread).order_by(
+            CheckpointModel.checkpoint_id.desc()
+        ).offset(self.keep_last - 1).limit(1).scalar()
+        if nth_newest is None:
+            return None
+
+        boundary = nth_newest
+        if self.keep_seconds:
+            boundary = min(boundary, checkpoint_id_at(time.time() - self.keep_seconds))
+
+        # Kept delta rows must still reach their snapshot: follow parent
+        # pointers (id/parent/type columns only, no blobs) down to it.
+        kept = {
+            row.checkpoint_id: row
+            for row in session.query(
+                CheckpointModel.checkpoint_id,
+                CheckpointModel.parent_checkpoint_id,
+                CheckpointModel.type
+            ).filter(*same_thread, CheckpointModel.checkpoint_id >= boundary)
+        }
+        if not kept:
+            return None
+        floor = min(kept)
+        rows = dict(kept)
+        for row in kept.values():
+            while row is not None and row.type == ROW_TYPE_DELTA and row.parent_checkpoint_id:
+                parent_id = row.parent_checkpoint_id
+                if parent_id in rows:
+                    parent = rows[parent_id]
+                else:
+                    parent = session.query(
+                        CheckpointModel.checkpoint_id,
+                        CheckpointModel.parent_checkpoint_id,
+                        CheckpointModel.type
+                    ).filter(*same_thread, CheckpointModel.checkpoint_id == parent_id).first()
+                    rows[parent_id] = parent
+                if parent is None:
+                    break
+                floor = min(floor, parent.checkpoint_id)
+                row = parent
+        return floor
+
+    # -- deletion -------------------------------------------------------------
+
+    def _delete_batch(self, thread_id: str, checkpoint_ns: str, cutoff: str) -> tuple[int, int, int]:
+        """Delete up to batch_size rows older than cutoff; returns (checkpoints, writes, bytes)"""
+        session = self.session_factory()
+        try:
+            same_thread = (
+                CheckpointModel.thread_id == thread_id,
+                CheckpointModel.checkpoint_ns == checkpoint_ns,
+            )
+            ids = [
+                row.checkpoint_id
+                for row in session.query(CheckpointModel.checkpoint_id).filter(
+                    *same_thread, CheckpointModel.checkpoint_id < cutoff
+                ).order_by(CheckpointModel.checkpoint_id).limit(self.batch_size)
+            ]
+            if not ids:
+                return 0, 0, 0
+
+            write_filter = (
+                CheckpointWriteModel.thread_id == thread_id,
+                CheckpointWriteModel.checkpoint_ns == checkpoint_ns,
+                CheckpointWriteModel.checkpoint_id.in_(ids),
+            )
+            checkpoint_bytes = session.query(
+                func.coalesce(func.sum(func.length(CheckpointModel.checkpoint) + func.length(CheckpointModel.meta)), 0)
+            ).filter(*same_thread, CheckpointModel.checkpoint_id.in_(ids)).scalar()
+            write_bytes = session.query(
+                func.coalesce(func.sum(func.length(CheckpointWriteModel.value)), 0)
+            ).filter(*write_filter).scalar()
+
+            writes = session.query(CheckpointWriteModel).filter(*write_filter).delete(synchronize_session=False)
+            checkpoints = session.query(CheckpointModel).filter(
+                *same_thread, CheckpointModel.checkpoint_id.in_(ids)
+            ).delete(synchronize_session=False)
+            session.commit()
+            return checkpoints, writes, int(checkpoint_bytes or 0) + int(write_bytes or 0)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def compact_thread(self, thread_id: str, checkpoint_ns: str = "") -> dict:
+        """Apply the retention policy to one thread/namespace"""
+        session = self.session_factory()
+        try:
+            cutoff = self._cutoff_id(session, thread_id, checkpoint_ns)
+        finally:
+            session.close()
+
+        report = {"checkpoints": 0, "writes": 0, "bytes": 0}
+        if cutoff is None:
+            return report
+        while not self._stop.is_set():
+            checkpoints, writes, reclaimed = self._delete_batch(thread_id, checkpoint_ns, cutoff)
+            report["checkpoints"] += checkpoints
+            report["writes"] += writes
+            report["bytes"] += reclaimed
+            if checkpoints < self.batch_size:
+                break
+        return report
+
+    def run_once(self) -> dict:
+        """Compact every thread once and return what was reclaimed"""
+        started = time.perf_counter()
+        report = {"threads": 0, "checkpoints": 0, "writes": 0, "bytes": 0}
+        last_key = None
+        while not self._stop.is_set():
+            session = self.session_factory()
+            try:
+                query = session.query(CheckpointModel.thread_id, CheckpointModel.checkpoint_ns).distinct()
+                if last_key is not None:
+                    query = query.filter(
+                        tuple_(CheckpointModel.thread_id, CheckpointModel.checkpoint_ns) > tuple_(*last_key)
+                    )
+                page = query.order_by(
+                    CheckpointModel.thread_id, CheckpointModel.checkpoint_ns
+                ).limit(self.THREAD_PAGE_SIZE).all()
+            finally:
+                session.close()
+            if not page:
+                break
+
+            for thread_id, checkpoint_ns in page:
+                try:
+                    thread_report = self.compact_thread(thread_id, checkpoint_ns)
+                except Exception as e:
+                    print(f"Error compacting checkpoints for thread {thread_id}: {e}")
+                    continue
+                report["threads"] += 1
+                for field in ("checkpoints", "writes", "bytes"):
+                    report[field] += thread_report[field]
+            last_key = tuple(page[-1])
+
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        self.last_report = report
+        print(
+            f"Checkpoint compaction: {report['threads']} threads scanned, "
+            f"{report['checkpoints']} checkpoints and {report['writes']} writes deleted, "
+            f"{report['bytes']} bytes reclaimed in {report['elapsed_seconds']}s"
+        )
+        return report
+
+    # -- background job -------------------------------------------------------
+
+    def _loop(self, interval: int) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Checkpoint compaction failed: {e}")
+
+    def start(self, interval: Optional[int] = None) -> None:
+        """Start the background compactor (no-op when the interval is 0)"""
+        interval = interval if interval is not None else self.INTERVAL_SECONDS
+        if interval <= 0 or (self._worker and self._worker.is_alive()):
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(
+            target=self._loop, args=(interval,), name="checkpoint-compactor", daemon=True
+        )
+        self._worker.start()
+
+    def stop(self) -> None:
+        """Stop the background compactor, interrupting a run between batches"""
+        self._stop.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+
+if __name__ == "__main__":
+    CheckpointCompactor().run_once()
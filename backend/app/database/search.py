@@ -0,0 +1,237 @@
+"""Full-text search over conversation history
+
+Searches the ``messages`` read model (one row per human/AI message, kept in
+sync at the end of every persisted turn) with the engine's native full-text
+index, so a query is an index lookup instead of a scan of checkpoint blobs:
+
+- MySQL/MariaDB: a FULLTEXT index on ``messages.content``, queried with
+  ``MATCH ... AGAINST`` in natural language mode (relevance ranked).
+- SQLite: an FTS5 table ``messages_fts`` maintained by triggers on
+  ``messages``, ranked with bm25(). ``messages`` has a composite primary
+  key, so its implicit rowid can be renumbered by VACUUM; the index is
+  keyed by ``messages_fts_ids`` instead, whose INTEGER PRIMARY KEY is
+  stable and maps to (thread_id, seq). Content is read through the
+  ``messages_fts_content`` view rather than stored twice.
+- PostgreSQL: a GIN index on ``to_tsvector(content)``, ranked with ts_rank.
+
+Other dialects fall back to an unranked LIKE scan. Matches are returned with
+an HTML snippet in which the matched terms are wrapped in ``<mark>``.
+"""
+import html
+import re
+import sys
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from app.database.config import DatabaseConfig
+
+FULLTEXT_INDEX = "ft_messages_content"
+PG_TS_CONFIG = "english"
+SNIPPET_CHARS = 160
+# Sentinels marking highlights until the snippet is HTML-escaped.
+_OPEN, _CLOSE = "\x02", "\x03"
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_FTS_DELETE = (
+    "INSERT INTO messages_fts(messages_fts, rowid, content) "
+    "SELECT 'delete', id, old.content FROM messages_fts_ids WHERE thread_id = old.thread_id AND seq = old.seq; "
+    "DELETE FROM messages_fts_ids WHERE thread_id = old.thread_id AND seq = old.seq; "
+)
+# last_insert_rowid() inside a trigger is the row the trigger just inserted.
+_SQLITE_FTS_INSERT = (
+    "INSERT INTO messages_fts_ids(thread_id, seq) VALUES (new.thread_id, new.seq); "
+    "INSERT INTO messages_fts(rowid, content) VALUES (last_insert_rowid(), new.content); "
+)
+_SQLITE_DDL = (
+    "CREATE TABLE IF NOT EXISTS messages_fts_ids ("
+    "id INTEGER PRIMARY KEY, thread_id VARCHAR(255) NOT NULL, seq INTEGER NOT NULL, "
+    "UNIQUE (thread_id, seq))",
+    "CREATE VIEW IF NOT EXISTS messages_fts_content AS "
+    "SELECT i.id AS id, m.content AS content FROM messages_fts_ids i "
+    "JOIN messages m ON m.thread_id = i.thread_id AND m.seq = i.seq",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "content, content='messages_fts_content', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN "
+    + _SQLITE_FTS_INSERT + "END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN "
+    + _SQLITE_FTS_DELETE + "END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE ON messages BEGIN "
+    + _SQLITE_FTS_DELETE + _SQLITE_FTS_INSERT + "END",
+)
+# The first layout keyed messages_fts by messages.rowid directly.
+_SQLITE_ROWID_LAYOUT = (
+    "DROP TRIGGER IF EXISTS messages_fts_ai",
+    "DROP TRIGGER IF EXISTS messages_fts_ad",
+    "DROP TRIGGER IF EXISTS messages_fts_au",
+    "DROP TABLE IF EXISTS messages_fts",
+)
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM.findall(query.lower())
+
+
+def ensure_search_index(engine=None) -> None:
+    """Create the full-text index for the engine's dialect (idempotent)"""
+    engine = engine or DatabaseConfig.get_engine()
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect in ("mysql", "mariadb"):
+            exists = conn.execute(text(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'messages' AND index_name = :name"
+            ), {"name": FULLTEXT_INDEX}).scalar()
+            if not exists:
+                print("Building full-text index on messages (one-time)...")
+                conn.execute(text(f"ALTER TABLE messages ADD FULLTEXT INDEX {FULLTEXT_INDEX} (content)"))
+        elif dialect == "sqlite":
+            created = not conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts_ids'"
+            )).first()
+            if created:
+                for statement in _SQLITE_ROWID_LAYOUT:
+                    conn.execute(text(statement))
+            for statement in _SQLITE_DDL:
+                conn.execute(text(statement))
+            if created:
+                # Index the rows written before the FTS table existed.
+                _sqlite_reindex(conn)
+        elif dialect == "postgresql":
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_messages_content_fts ON messages "
+                f"USING GIN (to_tsvector('{PG_TS_CONFIG}', content))"
+            ))
+
+
+def _sqlite_reindex(conn) -> None:
+    conn.execute(text(
+        "DELETE FROM messages_fts_ids WHERE NOT EXISTS (SELECT 1 FROM messages m "
+        "WHERE m.thread_id = messages_fts_ids.thread_id AND m.seq = messages_fts_ids.seq)"
+    ))
+    conn.execute(text(
+        "INSERT OR IGNORE INTO messages_fts_ids(thread_id, seq) SELECT thread_id, seq FROM messages"
+    ))
+    conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+
+
+def rebuild_search_index(engine=None) -> None:
+    """Re-index every message (SQLite; the other engines maintain their index)"""
+    engine = engine or DatabaseConfig.get_engine()
+    if engine.dialect.name == "sqlite":
+        ensure_search_index(engine)
+        with engine.begin() as conn:
+            _sqlite_reindex(conn)
+
+
+def _fts5_query(terms: List[str]) -> str:
+    # Quote every term so user input can never be read as FTS5 syntax; the
+    # last one is a prefix to match words still being typed.
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _highlight(content: str, terms: List[str]) -> str:
+    """Snippet around the first matched term with every match marked"""
+    start = 0
+    pattern = None
+    if terms:
+        pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+        first = pattern.search(content)
+        if first:
+            start = max(0, first.start() - SNIPPET_CHARS // 3)
+    window = content[start:start + SNIPPET_CHARS]
+    if pattern is not None:
+        window = pattern.sub(lambda m: f"{_OPEN}{m.group(0)}{_CLOSE}", window)
+    if start > 0:
+        window = "…" + window
+    if start + SNIPPET_CHARS < len(content):
+        window += "…"
+    return _to_html(window)
+
+
+def _to_html(snippet: str) -> str:
+    return html.escape(" ".join(snippet.split())).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+
+
+def search_messages(
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    thread_id: Optional[str] = None
+) -> dict:
+    """Ranked matches of query; fetches limit + 1 rows to detect another page"""
+    terms = search_terms(query)
+    if not terms:
+        return {"results": [], "next_offset": None}
+
+    engine = DatabaseConfig.get_engine()
+    dialect = engine.dialect.name
+    params = {"limit": limit + 1, "offset": offset, "thread_id": thread_id}
+    thread_filter = "AND m.thread_id = :thread_id" if thread_id else ""
+    columns = "m.thread_id, m.seq, m.role, m.created_at, t.title"
+    join = "LEFT JOIN thread_metadata t ON t.thread_id = m.thread_id"
+
+    if dialect == "sqlite":
+        params["q"] = _fts5_query(terms)
+        sql = (
+            f"SELECT {columns}, -bm25(messages_fts) AS score, "
+            f"snippet(messages_fts, 0, '{_OPEN}', '{_CLOSE}', '…', 24) AS snippet "
+            f"FROM messages_fts JOIN messages_fts_ids i ON i.id = messages_fts.rowid "
+            f"JOIN messages m ON m.thread_id = i.thread_id AND m.seq = i.seq {join} "
+            f"WHERE messages_fts MATCH :q {thread_filter} "
+            f"ORDER BY bm25(messages_fts) LIMIT :limit OFFSET :offset"
+        )
+    elif dialect in ("mysql", "mariadb"):
+        params["q"] = " ".join(terms)
+        sql = (
+            f"SELECT {columns}, m.content, MATCH(m.content) AGAINST (:q IN NATURAL LANGUAGE MODE) AS score "
+            f"FROM messages m {join} "
+            f"WHERE MATCH(m.content) AGAINST (:q IN NATURAL LANGUAGE MODE) {thread_filter} "
+            f"ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        )
+    elif dialect == "postgresql":
+        params["q"] = " ".join(terms)
+        vector = f"to_tsvector('{PG_TS_CONFIG}', m.content)"
+        tsquery = f"websearch_to_tsquery('{PG_TS_CONFIG}', :q)"
+        sql = (
+            f"SELECT {columns}, m.content, ts_rank({vector}, {tsquery}) AS score "
+            f"FROM messages m {join} "
+            f"WHERE {vector} @@ {tsquery} {thread_filter} "
+            f"ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        )
+    else:
+        like = []
+        for i, term in enumerate(terms):
+            params[f"t{i}"] = f"%{term}%"
+            like.append(f"LOWER(m.content) LIKE :t{i}")
+        sql = (
+            f"SELECT {columns}, m.content, 0 AS score FROM messages m {join} "
+            f"WHERE {' AND '.join(like)} {thread_filter} "
+            f"ORDER BY m.created_at DESC LIMIT :limit OFFSET :offset"
+        )
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+
+    results = []
+    for row in rows[:limit]:
+        snippet = _to_html(row["snippet"]) if "snippet" in row else _highlight(row["content"], terms)
+        results.append({
+            "thread_id": row["thread_id"],
+            "title": row["title"],
+            "seq": row["seq"],
+            "type": row["role"],
+            "snippet": snippet,
+            "score": float(row["score"] or 0),
+            "created_at": row["created_at"],
+        })
+    return {"results": results, "next_offset": offset + limit if len(rows) > limit else None}
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        rebuild_search_index()
+    else:
+        ensure_search_index()
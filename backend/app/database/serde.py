@@ -0,0 +1,131 @@
+"""Checkpoint blob serialization
+
+Checkpoint, metadata and write blobs are encoded with LangGraph's serde
+(msgpack for LangChain messages and plain data) and optionally compressed.
+Every blob starts with a small header so the format can evolve without a
+data migration:
+
+    MAGIC (3 bytes) | format version (1) | codec id (1) | type length (1) | type
+
+``type`` is the serde type tag returned by ``dumps_typed`` ("msgpack",
+"pickle", ...). Rows written before this format existed are raw pickle
+blobs; they never start with MAGIC (pickle protocol 2+ starts with 0x80), so
+``loads`` falls back to ``pickle.loads`` for them.
+"""
+import os
+import pickle
+import threading
+import zlib
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # optional dependency
+    lz4_frame = None
+
+
+MAGIC = b"OGC"
+FORMAT_VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_LZ4 = 3
+
+_CODEC_NAMES = {
+    "none": CODEC_NONE,
+    "zlib": CODEC_ZLIB,
+    "zstd": CODEC_ZSTD,
+    "lz4": CODEC_LZ4,
+}
+
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+class CheckpointSerializer:
+    """Encode/decode checkpoint blobs with a versioned, compressed header"""
+
+    COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", _default_codec()).lower()
+    COMPRESSION_LEVEL = int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+    # Tiny blobs (placeholders, small metadata) are not worth compressing.
+    MIN_COMPRESS_BYTES = int(os.getenv("CHECKPOINT_COMPRESSION_MIN_BYTES", "256"))
+
+    def __init__(self, serde=None, compression: Optional[str] = None):
+        self.serde = serde or JsonPlusSerializer(pickle_fallback=True)
+        name = (compression or self.COMPRESSION).lower()
+        if name not in _CODEC_NAMES:
+            raise ValueError(f"Unknown checkpoint compression '{name}'. Supported: {', '.join(_CODEC_NAMES)}")
+        if name == "zstd" and zstandard is None:
+            print("⚠ zstandard not installed, falling back to zlib checkpoint compression")
+            name = "zlib"
+        if name == "lz4" and lz4_frame is None:
+            print("⚠ lz4 not installed, falling back to zlib checkpoint compression")
+            name = "zlib"
+        self.codec = _CODEC_NAMES[name]
+        # zstd (de)compressor objects are not safe to share between threads.
+        self._local = threading.local()
+
+    def _zstd(self):
+        local = self._local
+        if not hasattr(local, "cctx"):
+            local.cctx = zstandard.ZstdCompressor(level=self.COMPRESSION_LEVEL)
+            local.dctx = zstandard.ZstdDecompressor()
+        return local.cctx, local.dctx
+
+    def _compress(self, codec: int, data: bytes) -> bytes:
+        if codec == CODEC_ZSTD:
+            return self._zstd()[0].compress(data)
+        if codec == CODEC_LZ4:
+            return lz4_frame.compress(data)
+        if codec == CODEC_ZLIB:
+            return zlib.compress(data, self.COMPRESSION_LEVEL)
+        return data
+
+    def _decompress(self, codec: int, data: bytes) -> bytes:
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise RuntimeError("Checkpoint blob is zstd-compressed but zstandard is not installed")
+            return self._zstd()[1].decompress(data)
+        if codec == CODEC_LZ4:
+            if lz4_frame is None:
+                raise RuntimeError("Checkpoint blob is lz4-compressed but lz4 is not installed")
+            return lz4_frame.decompress(data)
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(data)
+        if codec == CODEC_NONE:
+            return data
+        raise ValueError(f"Unknown checkpoint codec id {codec}")
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize obj into a headered blob"""
+        type_, payload = self.serde.dumps_typed(obj)
+        codec = self.codec if len(payload) >= self.MIN_COMPRESS_BYTES else CODEC_NONE
+        type_bytes = type_.encode("ascii")
+        header = MAGIC + bytes((FORMAT_VERSION, codec, len(type_bytes))) + type_bytes
+        return header + self._compress(codec, payload)
+
+    def loads(self, blob: Optional[bytes]) -> Any:
+        """Deserialize a blob written by dumps, or a legacy pickle blob"""
+        if blob is None:
+            return None
+        blob = bytes(blob)
+        if not blob.startswith(MAGIC):
+            return pickle.loads(blob)
+
+        version = blob[3]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint blob format version {version}")
+        codec = blob[4]
+        type_len = blob[5]
+        type_ = blob[6:6 + type_len].decode("ascii")
+        payload = self._decompress(codec, blob[6 + type_len:])
+        return self.serde.loads_typed((type_, payload))
@@ -0,0 +1,71 @@
+"""Import-time report with a regression budget
+
+Imports a module in a fresh interpreter under ``python -X importtime`` and
+prints the slowest imports by cumulative and by self time. Exits with
+status 1 when the module's total import time is over budget, so it can run
+in CI to catch a heavy dependency creeping back onto the boot path.
+
+Usage: ``python -m app.importtime [module] [--top N] [--budget MS]``
+(defaults: ``app``, 15, IMPORT_TIME_BUDGET_MS).
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+IMPORT_TIME_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", "4000"))
+
+
+def measure(module: str = "app") -> List[Dict]:
+    """Per-module timings (microseconds) from a fresh interpreter, in import order"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def report(module: str = "app", top: int = 15, budget_ms: int = IMPORT_TIME_BUDGET_MS) -> bool:
+    """Print the report; returns False when over budget"""
+    rows = measure(module)
+    # "import a.b" imports a, then a.b, each as a top-level entry.
+    parts = module.split(".")
+    chain = {".".join(parts[:i]) for i in range(1, len(parts) + 1)}
+    total_ms = sum(row["cumulative_us"] for row in rows if row["depth"] == 0 and row["module"] in chain) / 1000
+
+    print(f"Slowest imports by cumulative time (import {module}):")
+    for row in sorted(rows, key=lambda r: r["cumulative_us"], reverse=True)[:top]:
+        print(f"  {row['cumulative_us'] / 1000:9.1f} ms  {row['module']}")
+    print("Slowest imports by self time:")
+    for row in sorted(rows, key=lambda r: r["self_us"], reverse=True)[:top]:
+        print(f"  {row['self_us'] / 1000:9.1f} ms  {row['module']}")
+
+    within = total_ms <= budget_ms
+    print(f"Total: {total_ms:.1f} ms over {len(rows)} modules (budget {budget_ms} ms) - "
+          f"{'OK' if within else 'OVER BUDGET'}")
+    return within
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import time against a budget")
+    parser.add_argument("module", nargs="?", default="app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget", type=int, default=IMPORT_TIME_BUDGET_MS, help="budget in milliseconds")
+    args = parser.parse_args()
+    sys.exit(0 if report(args.module, args.top, args.budget) else 1)
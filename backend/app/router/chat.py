@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from typing import Optional, List
 import json
+import logging
 import os
 from app.schema.models import (
     ChatRequest,
@@ -17,17 +18,27 @@ from app.schema.models import (
     ThreadResponse,
     DocumentQueryRequest,
     DocumentQueryResponse,
-    DocumentInfoResponse
+    DocumentInfoResponse,
+    BulkDeleteRequest,
+    BulkDeleteResponse,
+    SearchResponse
 )
 from app.services.chat import ChatService
+from app.services.history import PAGE_SIZE
 from app.services.rag import ingest_document, retrieve_from_document, has_document, get_document_info, SUPPORTED_EXTENSIONS
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 chat_router = APIRouter()
 
+# Seconds a finished answer stream waits for a pending title event before
+# sending done. Kept short: the title is saved either way and the sidebar
+# picks it up on its next refresh.
+TITLE_STREAM_WAIT = float(os.getenv("TITLE_STREAM_WAIT", "0.3"))
+
 
 @chat_router.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
@@ -120,15 +131,45 @@ async def chat_stream(
         if not thread_id:
             thread_id = ChatService.create_new_thread()
 
-        # Generate thread title from first message if needed
-        ChatService.get_or_create_thread_title(thread_id, message)
+        # Title the thread in the background instead of delaying the first
+        # token; the result is sent as a "title" event on this stream.
+        title_task = ChatService.start_thread_title(thread_id, message)
+
+        def title_event(task):
+            try:
+                title = task.result()
+            except Exception:
+                # Also covers a task cancelled at shutdown; the answer goes on.
+                logger.exception("Title task for thread %s failed", thread_id)
+                return None
+            if not title:
+                return None
+            return f"data: {json.dumps({'message_type': 'title', 'title': title, 'thread_id': thread_id})}\n\n"
 
         def generate_stream():
             """Generator function for streaming responses"""
+            pending_title = title_task
             try:
                 for chunk in ChatService.stream_message(message, thread_id, tools_list):
                     # Send each chunk as JSON
                     yield f"data: {json.dumps(chunk)}\n\n"
+                    if pending_title is not None and pending_title.done():
+                        event = title_event(pending_title)
+                        pending_title = None
+                        if event:
+                            yield event
+
+                if pending_title is not None:
+                    # Short answers can finish first; give the title a brief
+                    # chance to land on this stream.
+                    try:
+                        pending_title.result(timeout=TITLE_STREAM_WAIT)
+                    except Exception:
+                        pass
+                    if pending_title.done():
+                        event = title_event(pending_title)
+                        if event:
+                            yield event
 
                 # Send final message with thread_id
                 yield f"data: {json.dumps({'thread_id': thread_id, 'done': True})}\n\n"
@@ -144,30 +185,78 @@ async def chat_stream(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Weak comparison of etag with an If-None-Match header (a tag list or *)"""
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
 @chat_router.get("/threads", response_model=ThreadListResponse)
-async def get_threads():
+async def get_threads(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size (omit for all threads)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page")
+):
     try:
-        threads = ChatService.get_all_threads()
+        # Unchanged sidebars get a 304 instead of the list body.
+        page = ChatService.get_threads_page(limit=limit, cursor=cursor)
+        etag = ChatService.get_threads_etag(page, limit, cursor)
+        if _etag_matches(etag, request.headers.get("if-none-match")):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
         
         # Convert to response model (already sorted by updated_at)
         thread_responses = [
             ThreadResponse(thread_id=t["thread_id"], title=t["title"])
-            for t in threads
+            for t in page["threads"]
         ]
-        
-        return ThreadListResponse(threads=thread_responses)
+
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return ThreadListResponse(threads=thread_responses, next_cursor=page["next_cursor"])
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@chat_router.get("/search", response_model=SearchResponse)
+def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search query"),
+    limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    offset: int = Query(0, ge=0, le=1000, description="Number of results to skip"),
+    thread_id: Optional[str] = Query(None, description="Only search this thread")
+):
+    """Search human and AI messages across all threads, most relevant first"""
+    try:
+        page = ChatService.search(q, limit, offset, thread_id)
+        return SearchResponse(query=q, results=page["results"], next_offset=page["next_offset"])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
 @chat_router.get("/threads/{thread_id}", response_model=ThreadHistoryResponse)
-async def get_thread_history(thread_id: str):
+def get_thread_history(
+    thread_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=500, description="Messages per page"),
+    before: Optional[int] = Query(None, ge=0, description="Only messages before this seq (from next_before)")
+):
     try:
-        messages = ChatService.load_conversation(thread_id)
+        page = ChatService.load_conversation(thread_id, limit, before)
      
         # The thread exists if it's in the thread metadata
-        if not messages:
+        if not page["messages"] and before is None:
             from app.services.chatbot import get_thread_title_from_db
             thread_exists = get_thread_title_from_db(thread_id) is not None
             
@@ -176,13 +265,15 @@ async def get_thread_history(thread_id: str):
         
         # Convert to response model
         message_responses = [
-            MessageResponse(content=m["content"], type=m["type"])
-            for m in messages
+            MessageResponse(content=m["content"], type=m["type"], seq=m["seq"])
+            for m in page["messages"]
         ]
         
         return ThreadHistoryResponse(
             thread_id=thread_id,
-            messages=message_responses
+            messages=message_responses,
+            next_before=page["next_before"],
+            human_offset=page["human_offset"]
         )
     
     except HTTPException:
@@ -259,6 +350,23 @@ async def upload_pdf(
         raise HTTPException(status_code=500, detail=f"Failed to process document: {str(e)}")
 
 
+@chat_router.delete("/threads", response_model=BulkDeleteResponse)
+def delete_threads(request: BulkDeleteRequest):
+    """Delete many threads at once; documents are removed in the background"""
+    try:
+        report = ChatService.delete_threads(request.thread_ids)
+        return BulkDeleteResponse(
+            status="success",
+            requested=report["requested"],
+            deleted=report["deleted"],
+            rows=report["rows"],
+            seconds=report["seconds"],
+            threads_per_second=report["threads_per_second"]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to delete threads: {str(e)}")
+
+
 @chat_router.delete("/threads/{thread_id}")
 async def delete_thread(thread_id: str):
     try:
@@ -298,6 +406,7 @@ async def query_document(request: DocumentQueryRequest):
         # Generate answer using the context
         context_text = "\n\n".join(retrieval_result["context"])
         
+        from langchain_groq import ChatGroq
         api = os.getenv("GROQ_API_KEY")
         llm = ChatGroq(model="openai/gpt-oss-120b", openai_api_key=api)
         prompt = f"""Based on the following context from a document, answer the question.
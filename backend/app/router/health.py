@@ -1,4 +1,10 @@
+import time
+
 from fastapi import APIRouter
+from sqlalchemy import text
+
+from app.database.config import DatabaseConfig
+from app.database.pool import pool_status
 
 health_router = APIRouter()
 
@@ -12,4 +18,45 @@ async def root():
 
 @health_router.get("/health")
 async def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@health_router.get("/health/details")
+def health_details():
+    """Database round trip, connection pool occupancy/wait metrics and
+    checkpointer cache/lock counters"""
+    details = {"status": "ok"}
+
+    engine = DatabaseConfig.get_engine()
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        details["database"] = {
+            "status": "ok",
+            "ping_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+    except Exception as e:
+        details["status"] = "degraded"
+        details["database"] = {"status": "error", "error": str(e)}
+
+    details["pool"] = pool_status(engine)
+    if DatabaseConfig._async_engine is not None:
+        details["async_pool"] = pool_status(DatabaseConfig._async_engine.sync_engine)
+
+    from app.services.chatbot import check_pointer, activity_tracker, thread_metadata_cache
+    details["checkpointer"] = check_pointer.stats()
+    details["thread_activity"] = activity_tracker.stats()
+    details["thread_metadata_cache"] = thread_metadata_cache.stats()
+
+    from app.services.titles import title_service
+    details["titles"] = title_service.stats()
+
+    from app.services.cleanup import thread_purger
+    details["thread_purge"] = thread_purger.stats()
+
+    from app.services.retrievers import retriever_cache
+    details["retrievers"] = retriever_cache.stats()
+
+    from app.services.embedding_cache import embedding_cache
+    details["embedding_cache"] = embedding_cache.stats()
+    return details
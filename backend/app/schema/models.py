@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
 from typing import Optional, List, Dict, Any
 
 
@@ -53,6 +54,7 @@ class ThreadListResponse(BaseModel):
     """Response model for list of threads"""
 
     threads: List[ThreadResponse] = Field(..., description="List of all threads")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, None on the last page")
 
 
 class MessageResponse(BaseModel):
@@ -60,13 +62,36 @@ class MessageResponse(BaseModel):
 
     content: str = Field(..., description="Message content")
     type: str = Field(..., description="Message type (human, ai, tool)")
+    seq: Optional[int] = Field(None, description="Position of the message in the thread")
 
 
 class ThreadHistoryResponse(BaseModel):
     """Response model for thread conversation history"""
 
     thread_id: str = Field(..., description="Thread ID")
-    messages: List[MessageResponse] = Field(..., description="List of messages in thread")
+    messages: List[MessageResponse] = Field(..., description="Page of messages in thread, oldest first")
+    next_before: Optional[int] = Field(None, description="Pass as `before` to load older messages; None when there are none")
+    human_offset: int = Field(0, description="Number of human messages before this page")
+
+
+class SearchResult(BaseModel):
+    """A message matching a search query"""
+
+    thread_id: str = Field(..., description="Thread containing the message")
+    title: Optional[str] = Field(None, description="Thread title")
+    seq: int = Field(..., description="Position of the message in the thread")
+    type: str = Field(..., description="Message type (human, ai)")
+    snippet: str = Field(..., description="HTML-escaped excerpt with matches wrapped in <mark>")
+    score: float = Field(..., description="Relevance (higher is better)")
+    created_at: Optional[datetime] = Field(None, description="When the message was stored")
+
+
+class SearchResponse(BaseModel):
+    """Response model for message search"""
+
+    query: str = Field(..., description="Search query")
+    results: List[SearchResult] = Field(..., description="Matches, most relevant first")
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, None on the last page")
 
 
 class UpdateTitleRequest(BaseModel):
@@ -75,6 +100,23 @@ class UpdateTitleRequest(BaseModel):
     title: str = Field(..., min_length=1, max_length=100, description="New title for the thread")
 
 
+class BulkDeleteRequest(BaseModel):
+    """Request model for deleting threads in bulk"""
+
+    thread_ids: List[str] = Field(..., min_length=1, max_length=10000, description="Thread IDs to delete")
+
+
+class BulkDeleteResponse(BaseModel):
+    """Response model for bulk thread deletion"""
+
+    status: str = Field(..., description="Operation status")
+    requested: int = Field(..., description="Number of distinct thread IDs requested")
+    deleted: int = Field(..., description="Number of threads that existed and were deleted")
+    rows: Dict[str, int] = Field(..., description="Rows deleted per table")
+    seconds: float = Field(..., description="Time spent deleting database rows")
+    threads_per_second: Optional[float] = Field(None, description="Deletion throughput")
+
+
 class NewThreadResponse(BaseModel):
     """Response model for creating a new thread"""
 
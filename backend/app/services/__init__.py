@@ -1,14 +1,36 @@
 """
 Services package for business logic
+
+Names are resolved on first access (PEP 562) so that importing one service
+module, e.g. app.services.history, does not build the chatbot graph and its
+LLM clients as a side effect.
 """
+import importlib
+
+_EXPORTS = {
+    "ChatService": "chat",
+    "ingest_pdf": "rag",
+    "retrieve_from_document": "rag",
+    "has_document": "rag",
+    "get_document_info": "rag",
+    "generate_thread_id": "thread",
+    "generate_id_name": "thread",
+    "generate_thread_title": "thread",
+    "title_service": "titles",
+    "extractive_title": "titles",
+    "retrieve_all_threads": "chatbot",
+    "save_thread_title": "chatbot",
+    "get_thread_title_from_db": "chatbot",
+    "get_all_thread_metadata": "chatbot",
+}
+
+__all__ = list(_EXPORTS)
+
 
-from .chat import ChatService
-from .rag import ingest_pdf, retrieve_from_document, has_document, get_document_info
-from .thread import generate_thread_id, generate_id_name, generate_thread_title
-from .chatbot import (
-    chatbot,
-    retrieve_all_threads,
-    save_thread_title,
-    get_thread_title_from_db,
-    get_all_thread_metadata
-)
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
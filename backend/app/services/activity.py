@@ -0,0 +1,138 @@
+"""Coalesced thread activity timestamps
+
+Every chat turn used to end with a synchronous transaction that bumped the
+thread's ``updated_at``. ThreadActivityTracker records the time of the
+latest turn per thread in memory instead and writes all pending threads
+with one ``UPDATE ... SET updated_at = CASE ...`` per batch, on an interval,
+before the thread list is read and at shutdown.
+
+Timestamps are taken on the application clock and shifted onto the
+database clock at flush time (``updated_at`` is otherwise set by the
+database), so sidebar ordering stays consistent even when the two clocks
+or time zones differ. ``updated_at`` never moves backwards.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func, select, update, or_
+
+from app.database.models import ThreadMetadata
+
+
+class ThreadActivityTracker:
+    """Buffers last-activity times per thread and flushes them in batches"""
+
+    # Seconds between background flushes; 0 flushes on every record.
+    FLUSH_INTERVAL = float(os.getenv("THREAD_ACTIVITY_FLUSH_INTERVAL", "5"))
+    BATCH_SIZE = 500
+
+    def __init__(self, session_factory, flush_interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval if flush_interval is not None else self.FLUSH_INTERVAL
+        self._pending: dict[str, datetime] = {}
+        self._guard = threading.Lock()
+        # Serializes flushes so two callers never write the same batch.
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def record(self, thread_id: str) -> None:
+        """Note activity on thread_id now"""
+        with self._guard:
+            self._pending[thread_id] = datetime.now()
+        if self.flush_interval <= 0:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._guard:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write all pending timestamps; returns the number of threads flushed"""
+        with self._flush_lock:
+            with self._guard:
+                if not self._pending:
+                    return 0
+                pending, self._pending = self._pending, {}
+            try:
+                self._write(pending)
+            except Exception:
+                # Put them back unless newer activity was recorded meanwhile.
+                with self._guard:
+                    for thread_id, at in pending.items():
+                        if self._pending.get(thread_id, at) <= at:
+                            self._pending[thread_id] = at
+                raise
+            self.flushes += 1
+            self.rows_written += len(pending)
+            return len(pending)
+
+    def _write(self, pending: dict) -> None:
+        session = self.session_factory()
+        try:
+            # Map application time onto the database clock.
+            db_now = session.execute(select(func.current_timestamp())).scalar()
+            offset = timedelta(0)
+            if isinstance(db_now, datetime):
+                offset = db_now.replace(tzinfo=None) - datetime.now()
+            items = list(pending.items())
+            for start in range(0, len(items), self.BATCH_SIZE):
+                batch = {
+                    thread_id: (at + offset).replace(microsecond=0)
+                    for thread_id, at in items[start:start + self.BATCH_SIZE]
+                }
+                new_value = case(
+                    {thread_id: at for thread_id, at in batch.items()},
+                    value=ThreadMetadata.thread_id
+                )
+                session.execute(
+                    update(ThreadMetadata).where(
+                        ThreadMetadata.thread_id.in_(batch),
+                        or_(ThreadMetadata.updated_at.is_(None), ThreadMetadata.updated_at < new_value)
+                    ).values(updated_at=new_value).execution_options(synchronize_session=False)
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "flush_interval": self.flush_interval,
+        }
+
+    # -- background flusher ---------------------------------------------------
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing thread activity: {e}")
+
+    def start(self) -> None:
+        if self.flush_interval <= 0 or (self._worker and self._worker.is_alive()):
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._loop, name="thread-activity", daemon=True)
+        self._worker.start()
+
+    def stop(self) -> None:
+        """Stop the background flusher and write whatever is still pending"""
+        self._stop.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+            self._worker = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing thread activity at shutdown: {e}")
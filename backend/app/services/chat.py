@@ -1,18 +1,39 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from typing import Optional, List, Dict, Any
-from datetime import datetime, date
+from datetime import date, datetime
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, RemoveMessage
 from app.services.chatbot import (
     chatbot,
     chatbot_memory,
-    retrieve_all_threads,
+    check_pointer,
+    get_thread_list,
     save_thread_title,
     get_thread_title_from_db,
-    get_all_thread_metadata,
     touch_thread
 )
-from app.services.thread import generate_thread_id, generate_id_name
+from app.services.thread import generate_thread_id
+from app.services.titles import title_service
+from app.services.cleanup import thread_purger
+from app.services.history import PAGE_SIZE, get_message_page, sync_thread_messages
+from app.database.search import search_messages
 from app.services.rag import has_document
 
+logger = logging.getLogger(__name__)
+
+# Background title generation for new threads (runs alongside the answer).
+# Workers mostly wait on title_service, which batches their requests.
+TITLE_WORKERS = int(os.getenv("TITLE_WORKERS", "16"))
+_title_executor = ThreadPoolExecutor(max_workers=TITLE_WORKERS, thread_name_prefix="thread-title")
+_titles_in_flight: Dict[str, Future] = {}
+_titles_guard = threading.Lock()
+
 class ChatService:
     """Service class to handle chat-related business logic"""
     
@@ -34,7 +55,7 @@ class ChatService:
         # Generate new title from user message
         if user_message:
             try:
-                title = generate_id_name(user_message)
+                title = title_service.generate(user_message)
                 save_thread_title(thread_id, title)
                 return title
             except Exception as e:
@@ -42,52 +63,133 @@ class ChatService:
                 return str(thread_id)[:8] + "..."
         
         return str(thread_id)[:8] + "..."
+
+    @staticmethod
+    def start_thread_title(thread_id: str, user_message: str) -> Optional[Future]:
+        """Generate and save a thread's title in the background.
+
+        Returns a Future resolving to the new title, or None when the thread
+        already has one. Concurrent calls for the same thread share a Future.
+        """
+        db_title = get_thread_title_from_db(thread_id)
+        if db_title and db_title != "New Chat":
+            return None
+
+        with _titles_guard:
+            future = _titles_in_flight.get(thread_id)
+            if future is not None:
+                return future
+            future = _title_executor.submit(ChatService._generate_thread_title, thread_id, user_message)
+            _titles_in_flight[thread_id] = future
+        # Outside the guard: a future that is already done runs the callback
+        # inline, and _forget_title_task takes the guard itself.
+        future.add_done_callback(lambda _: ChatService._forget_title_task(thread_id, future))
+        return future
+
+    @staticmethod
+    def _forget_title_task(thread_id: str, future: Future) -> None:
+        with _titles_guard:
+            if _titles_in_flight.get(thread_id) is future:
+                del _titles_in_flight[thread_id]
+
+    @staticmethod
+    def _generate_thread_title(thread_id: str, user_message: str) -> Optional[str]:
+        # A title is optional: any failure (LLM or database) means no title
+        # event, never a failed answer stream.
+        try:
+            title = title_service.generate(user_message)
+            if not title:
+                return None
+            # The user may have renamed the thread while the title was generated.
+            if get_thread_title_from_db(thread_id) not in (None, "New Chat"):
+                return None
+            save_thread_title(thread_id, title)
+            return title
+        except Exception:
+            logger.exception("Failed to title thread %s", thread_id)
+            return None
     
     @staticmethod
     def get_all_threads() -> List[Dict[str, str]]:
-        thread_ids = retrieve_all_threads()
-        metadata = get_all_thread_metadata()
-        
-        threads = []
-        for tid in thread_ids:
-            thread_meta = metadata.get(tid, {})
-            title = thread_meta.get("title", "New Chat") if isinstance(thread_meta, dict) else thread_meta
-            updated_at = thread_meta.get("updated_at") if isinstance(thread_meta, dict) else None
-            threads.append({
-                "thread_id": tid,
-                "title": title,
-                "updated_at": updated_at
-            })
-        
-        # Sort by updated_at descending (most recent first)
-        threads.sort(key=lambda x: x.get("updated_at") or datetime.min, reverse=True)
-        
-        return threads
+        # Already sorted by updated_at descending (most recent first)
+        return get_thread_list()
+
+    @staticmethod
+    def _encode_cursor(thread: Dict[str, Any]) -> str:
+        updated_at = thread["updated_at"].isoformat() if thread["updated_at"] else None
+        raw = json.dumps([updated_at, thread["thread_id"]]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            updated_at, thread_id = json.loads(base64.urlsafe_b64decode(padded))
+            return datetime.fromisoformat(updated_at), str(thread_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    @staticmethod
+    def get_threads_page(limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """One page of threads plus the cursor of the next page (None at the end).
+
+        Without a limit every thread is returned in one page.
+        """
+        after = ChatService._decode_cursor(cursor) if cursor else None
+        # Fetch one extra row to know whether another page follows.
+        threads = get_thread_list(limit=limit + 1 if limit else None, after=after)
+        next_cursor = None
+        if limit and len(threads) > limit:
+            threads = threads[:limit]
+            next_cursor = ChatService._encode_cursor(threads[-1])
+        return {"threads": threads, "next_cursor": next_cursor}
+
+    @staticmethod
+    def get_threads_etag(page: Dict[str, Any], *parts: Any) -> str:
+        """Weak ETag of a thread list page, scoped to the request's paging parameters.
+
+        Fingerprints the page itself (ids, titles, updated_at, next cursor):
+        a version derived from MAX(updated_at) and COUNT(*) misses renames in
+        the same second as the newest change and threads entering the list
+        with their first checkpoint.
+        """
+        rows = [(t["thread_id"], t["title"], t["updated_at"]) for t in page["threads"]]
+        key = json.dumps([rows, page["next_cursor"], *parts], default=str)
+        return 'W/"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
     
     @staticmethod
-    def load_conversation(thread_id: str) -> List[Dict[str, str]]:
+    def load_conversation(thread_id: str, limit: int = PAGE_SIZE, before: Optional[int] = None) -> Dict[str, Any]:
+        """A page of the thread's history from the messages read model"""
+        page = get_message_page(thread_id, limit, before)
+        if page["messages"] or before is not None:
+            return page
+
+        # Threads from before the read model existed: build it once from
+        # the latest checkpoint.
         try:
             state = chatbot.get_state(config={"configurable": {"thread_id": thread_id}})
-            messages = state.values.get("messages", [])
-            
-            formatted_messages = []
-            for message in messages:
-                if isinstance(message, HumanMessage):
-                    formatted_messages.append({
-                        "content": message.content,
-                        "type": "human"
-                    })
-                elif isinstance(message, AIMessage):
-                    if message.content:
-                        formatted_messages.append({
-                            "content": message.content,
-                            "type": "ai"
-                        })
-            
-            return formatted_messages
+            messages = state.values.get("messages", []) if state and state.values else []
+            if messages and sync_thread_messages(thread_id, messages):
+                page = get_message_page(thread_id, limit, before)
         except Exception as e:
             print(f"Error loading conversation: {e}")
-            return []
+        return page
+
+    @staticmethod
+    def search(query: str, limit: int = 20, offset: int = 0, thread_id: Optional[str] = None) -> Dict[str, Any]:
+        """Full-text search over every persisted conversation"""
+        return search_messages(query, limit, offset, thread_id)
+
+    @staticmethod
+    def _sync_history(thread_id: str, messages=None) -> None:
+        """Update the messages read model after a persisted turn"""
+        try:
+            if messages is None:
+                state = chatbot.get_state(config={"configurable": {"thread_id": thread_id}})
+                messages = state.values.get("messages", []) if state and state.values else []
+            sync_thread_messages(thread_id, messages)
+        except Exception as e:
+            print(f"Warning: Failed to update message history for thread {thread_id}: {e}")
     
     @staticmethod
     def send_message(message: str, thread_id: str, tools: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -138,20 +240,23 @@ class ChatService:
             # Check if thread has a document
             doc_exists = has_document(thread_id)
             
-            # Invoke chatbot with user message
-            final_state = chatbot.invoke(
-                {
-                    "messages": [HumanMessage(content=message)],
-                    "has_document": doc_exists,
-                    "thread_id": thread_id
-                },
-                config=config
-            )
+            # Invoke chatbot with user message (checkpoints of the turn are
+            # flushed together when write-behind buffering is enabled)
+            with check_pointer.buffered(thread_id):
+                final_state = chatbot.invoke(
+                    {
+                        "messages": [HumanMessage(content=message)],
+                        "has_document": doc_exists,
+                        "thread_id": thread_id
+                    },
+                    config=config
+                )
             
             messages = final_state["messages"]
             
             # Update thread timestamp to show recent activity
             touch_thread(thread_id)
+            ChatService._sync_history(thread_id, messages)
             
             # Extract the last AI message
             ai_response = None
@@ -217,40 +322,42 @@ class ChatService:
                     }
 
             # Chatbot path: drop the trailing assistant turn, then re-run
-            current = chatbot.get_state(config)
-            messages = list(current.values["messages"]) if current and current.values else []
-
-            last_ai_idx = None
-            for i in reversed(range(len(messages))):
-                if isinstance(messages[i], AIMessage):
-                    last_ai_idx = i
-                    break
-
-            if last_ai_idx is None:
-                raise Exception("No AI response found to regenerate")
-
-            # Remove the assistant turn (and any tool results that follow it)
-            removals = [
-                RemoveMessage(id=m.id)
-                for m in messages[last_ai_idx:]
-                if getattr(m, "id", None)
-            ]
-            if removals:
-                chatbot.update_state(current.config, {"messages": removals})
-
-            doc_exists = has_document(thread_id)
-
-            final_state = chatbot.invoke(
-                {
-                    "messages": [],
-                    "has_document": doc_exists,
-                    "thread_id": thread_id,
-                },
-                config=config,
-            )
+            with check_pointer.buffered(thread_id):
+                current = chatbot.get_state(config)
+                messages = list(current.values["messages"]) if current and current.values else []
+
+                last_ai_idx = None
+                for i in reversed(range(len(messages))):
+                    if isinstance(messages[i], AIMessage):
+                        last_ai_idx = i
+                        break
+
+                if last_ai_idx is None:
+                    raise Exception("No AI response found to regenerate")
+
+                # Remove the assistant turn (and any tool results that follow it)
+                removals = [
+                    RemoveMessage(id=m.id)
+                    for m in messages[last_ai_idx:]
+                    if getattr(m, "id", None)
+                ]
+                if removals:
+                    chatbot.update_state(current.config, {"messages": removals})
+
+                doc_exists = has_document(thread_id)
+
+                final_state = chatbot.invoke(
+                    {
+                        "messages": [],
+                        "has_document": doc_exists,
+                        "thread_id": thread_id,
+                    },
+                    config=config,
+                )
 
             out_messages = final_state["messages"]
             touch_thread(thread_id)
+            ChatService._sync_history(thread_id, out_messages)
 
             ai_response = None
             has_tool_calls = False
@@ -272,6 +379,26 @@ class ChatService:
 
     @staticmethod
     def _stream_chatbot(graph, config, doc_exists: bool, human_message, temporary: bool = False):
+        """Run one streamed chatbot turn, buffering its checkpoint writes.
+
+        With write-behind buffering enabled the checkpoints of the whole turn
+        (graph supersteps plus the final persist) are flushed in a single
+        transaction when the stream ends, including when the client
+        disconnects mid-stream. Temporary chats never touch the database.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        buffer = nullcontext() if temporary else check_pointer.buffered(thread_id)
+        try:
+            with buffer:
+                yield from ChatService._stream_chatbot_turn(graph, config, doc_exists, human_message, temporary)
+        finally:
+            # Also after a client disconnect: the checkpoint holds whatever
+            # part of the turn completed.
+            if not temporary:
+                ChatService._sync_history(thread_id)
+
+    @staticmethod
+    def _stream_chatbot_turn(graph, config, doc_exists: bool, human_message, temporary: bool = False):
         """Yield live-thinking/ai chunks while running the chatbot graph.
 
         When ``human_message`` is provided it is sent as a new turn; when it is
@@ -537,6 +664,7 @@ class ChatService:
                                     }
 
                     touch_thread(thread_id)
+                    ChatService._sync_history(thread_id)
                     return
                 except Exception as blog_error:
                     error_msg = str(blog_error)
@@ -572,62 +700,15 @@ class ChatService:
     @staticmethod
     def delete_thread(thread_id: str) -> bool:
         """Delete a thread and all its associated data"""
-        from app.database import DatabaseConfig, ThreadMetadata, DocumentMetadata, Checkpoint, CheckpointWrite
-        from app.services.rag import _thread_paths
-        import os
-        
-        session = DatabaseConfig.get_session_factory()()
         try:
-            # Delete from database tables (cascade will handle related records)
-            
-            # Delete checkpoints and checkpoint writes
-            session.query(CheckpointWrite).filter_by(thread_id=thread_id).delete()
-            session.query(Checkpoint).filter_by(thread_id=thread_id).delete()
-            
-            # Delete document metadata (this should cascade from thread_metadata but let's be explicit)
-            session.query(DocumentMetadata).filter_by(thread_id=thread_id).delete()
-            
-            # Delete thread metadata
-            session.query(ThreadMetadata).filter_by(thread_id=thread_id).delete()
-            
-            session.commit()
-            
-            # Clean up storage files (uploaded document + metadata JSON). The
-            # document path lives in the thread's RAG metadata (extension may
-            # vary: .pdf/.md/.txt), so read it from there.
-            try:
-                from app.services.rag import _read_metadata
-                meta_path = os.path.join(
-                    os.path.dirname(__file__), "..", "storage", "documents", f"{thread_id}.json"
-                )
-                meta = _read_metadata(thread_id) or {}
-                doc_path = meta.get("file_path")
-                if doc_path and os.path.exists(doc_path):
-                    os.remove(doc_path)
-                    print(f"Deleted document file: {doc_path}")
-                if os.path.exists(meta_path):
-                    os.remove(meta_path)
-                    print(f"Deleted metadata file: {meta_path}")
-            except Exception as e:
-                print(f"Warning: Failed to delete storage files for thread {thread_id}: {e}")
-                # Don't fail the whole operation if file cleanup fails
-            
-            # Clear any in-memory caches
-            try:
-                from app.services.rag import _THREAD_RETRIEVERS, _THREAD_METADATA
-                if thread_id in _THREAD_RETRIEVERS:
-                    del _THREAD_RETRIEVERS[thread_id]
-                if thread_id in _THREAD_METADATA:
-                    del _THREAD_METADATA[thread_id]
-            except Exception as e:
-                print(f"Warning: Failed to clear thread cache for {thread_id}: {e}")
-            
+            thread_purger.purge([thread_id])
             print(f"Successfully deleted thread: {thread_id}")
             return True
-            
         except Exception as e:
-            session.rollback()
             print(f"Error deleting thread {thread_id}: {e}")
             return False
-        finally:
-            session.close()
+
+    @staticmethod
+    def delete_threads(thread_ids: List[str]) -> Dict[str, Any]:
+        """Delete many threads in chunked transactions; files are removed in the background"""
+        return thread_purger.purge(thread_ids)
@@ -3,28 +3,50 @@ from langsmith import traceable
 from typing import TypedDict, Annotated
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langgraph.graph.message import add_messages
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode, tools_condition
 from langgraph.checkpoint.memory import MemorySaver
 from app.tools import Search, Weather, Calculator, Stock_price
 from app.services.rag import has_document, retrieve_from_document
-from app.database import DatabaseConfig,MySQLCheckpointSaver,ThreadMetadata
+from app.services.activity import ThreadActivityTracker
+from app.database import DatabaseConfig,MySQLCheckpointSaver,ThreadMetadata,Checkpoint
+from sqlalchemy import exists, tuple_
+from collections import OrderedDict
 import os
+import threading
+import time
+import uuid
+
+try:
+    import redis
+except ImportError:  # cross-process invalidation is optional
+    redis = None
 
 load_dotenv()
 
 api = os.getenv("GROQ_API_KEY")
 
-model = ChatGroq(
-    model="openai/gpt-oss-120b",
-    api_key=api
-    )
-
 # Available tools for the chatbot
 all_tools = [Search, Weather, Calculator, Stock_price]
 
+_model_with_tools = None
+_model_lock = threading.Lock()
+
+
+def get_model_with_tools():
+    """The chat LLM bound to all_tools, created on first call (importing needs no API key)"""
+    global _model_with_tools
+    if _model_with_tools is None:
+        with _model_lock:
+            if _model_with_tools is None:
+                from langchain_groq import ChatGroq
+                model = ChatGroq(
+                    model="openai/gpt-oss-120b",
+                    api_key=api
+                    )
+                _model_with_tools = model.bind_tools(all_tools)
+    return _model_with_tools
+
 
 class Chatstate(TypedDict):
     """State definition for the chatbot"""
@@ -78,8 +100,7 @@ If the user's question is related to the document, base your answer on this cont
     else:
         print(f"[DEBUG] Skipping document retrieval - thread_id: {thread_id}, has_doc: {has_doc}")
     
-    model_with_tools = model.bind_tools(all_tools)
-    for chunk in model_with_tools.stream(messages):
+    for chunk in get_model_with_tools().stream(messages):
         yield {"messages": [chunk]}
 
 
@@ -109,19 +130,178 @@ chatbot_memory = graph.compile(checkpointer=memory_checkpointer)
 # Database session factory
 Session = DatabaseConfig.get_session_factory()
 
+# Last-activity timestamps, written in batches (see app.services.activity)
+activity_tracker = ThreadActivityTracker(Session)
+
+
+class ThreadMetadataCache:
+    """Bounded TTL/LRU cache of thread titles (and of missing threads).
+
+    Filled on reads and written through by save_thread_title, so title and
+    existence checks skip the database in steady state. With
+    THREAD_CACHE_REDIS_URL set (and redis installed), changes are published
+    so other workers drop their copy; otherwise entries from other workers'
+    writes can be stale for up to TTL seconds.
+    """
+
+    MAX_ENTRIES = int(os.getenv("THREAD_CACHE_MAX_ENTRIES", "10000"))
+    TTL = float(os.getenv("THREAD_CACHE_TTL", "300"))
+    # A thread that does not exist yet may be created by another worker.
+    MISSING_TTL = float(os.getenv("THREAD_CACHE_MISSING_TTL", "5"))
+    REDIS_URL = os.getenv("THREAD_CACHE_REDIS_URL")
+    CHANNEL = "opengpt:thread-metadata"
+    _MISSING = object()
+
+    def __init__(self):
+        self._entries: OrderedDict = OrderedDict()
+        self._guard = threading.Lock()
+        self._origin = uuid.uuid4().hex
+        self._redis = None
+        # Bumped by every write-through and invalidation; see fill().
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+        if self.REDIS_URL and redis is not None:
+            try:
+                self._redis = redis.Redis.from_url(self.REDIS_URL)
+                threading.Thread(target=self._listen, name="thread-cache-invalidation", daemon=True).start()
+            except Exception as e:
+                print(f"Warning: thread cache invalidation via Redis disabled: {e}")
+                self._redis = None
+        elif self.REDIS_URL:
+            print("Warning: THREAD_CACHE_REDIS_URL is set but redis is not installed")
+
+    def get(self, thread_id: str):
+        """(found, title); title is None for a thread known not to exist"""
+        with self._guard:
+            entry = self._entries.get(thread_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[thread_id]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(thread_id)
+            self.hits += 1
+            return True, (None if entry[0] is self._MISSING else entry[0])
+
+    def set(self, thread_id: str, title: str | None, publish: bool = False) -> None:
+        """Cache title (None: thread does not exist); publish after a write"""
+        with self._guard:
+            self._version += 1
+            self._store(thread_id, title)
+        if publish:
+            self._publish(thread_id)
+
+    def version(self) -> int:
+        """Token to pass to fill() for a value about to be read from the database"""
+        with self._guard:
+            return self._version
+
+    def fill(self, thread_id: str, title: str | None, version: int) -> None:
+        """Cache a value read from the database, unless a write or
+        invalidation happened since version() was taken (the read may
+        predate it and would overwrite the fresher entry for a full TTL)"""
+        with self._guard:
+            if self._version == version:
+                self._store(thread_id, title)
+
+    def _store(self, thread_id: str, title: str | None) -> None:
+        ttl = self.TTL if title is not None else self.MISSING_TTL
+        self._entries[thread_id] = (title if title is not None else self._MISSING, time.monotonic() + ttl)
+        self._entries.move_to_end(thread_id)
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, thread_id: str, publish: bool = True) -> None:
+        with self._guard:
+            self._version += 1
+            self._entries.pop(thread_id, None)
+        if publish:
+            self._publish(thread_id)
+
+    def _publish(self, thread_id: str) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.publish(self.CHANNEL, f"{self._origin}:{thread_id}")
+        except Exception as e:
+            print(f"Warning: failed to publish thread cache invalidation: {e}")
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    origin, _, thread_id = message["data"].decode().partition(":")
+                    if origin != self._origin:
+                        self.invalidate(thread_id, publish=False)
+            except Exception as e:
+                print(f"Thread cache invalidation listener error: {e}")
+                # Anything may have changed while disconnected.
+                with self._guard:
+                    self._version += 1
+                    self._entries.clear()
+                time.sleep(1)
+
+    def stats(self) -> dict:
+        with self._guard:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "cross_process": self._redis is not None,
+            }
+
+
+thread_metadata_cache = ThreadMetadataCache()
+
 
 # Thread management functions
 
 def retrieve_all_threads():
-    """Retrieve all thread IDs from the checkpointer"""
-    all_threads = set()
+    """Retrieve all thread IDs that have checkpoints"""
+    session = Session()
     try:
-        for checkpoint_tuple in check_pointer.list(None):
-            # checkpoint_tuple is a CheckpointTuple with .config attribute
-            all_threads.add(checkpoint_tuple.config["configurable"]["thread_id"])
+        # DISTINCT on the primary-key prefix: an index scan, no blob reads
+        return [row.thread_id for row in session.query(Checkpoint.thread_id).distinct()]
     except Exception as e:
         print(f"Error retrieving threads: {e}")
-    return list(all_threads)
+        return []
+    finally:
+        session.close()
+
+
+def get_thread_list(limit: int | None = None, after: tuple | None = None):
+    """Get threads that have checkpoints, most recently updated first.
+
+    Ordered by (updated_at, thread_id) descending, which idx_updated_at
+    serves directly (InnoDB secondary indexes carry the primary key).
+    ``after`` is the (updated_at, thread_id) of the last row of the previous
+    page. The EXISTS probe only touches the checkpoints primary-key index.
+    """
+    # Ordering depends on updated_at, so write buffered activity first.
+    activity_tracker.flush()
+    session = Session()
+    try:
+        has_checkpoints = exists().where(Checkpoint.thread_id == ThreadMetadata.thread_id)
+        query = session.query(
+            ThreadMetadata.thread_id,
+            ThreadMetadata.title,
+            ThreadMetadata.updated_at
+        ).filter(has_checkpoints)
+        if after is not None:
+            query = query.filter(tuple_(ThreadMetadata.updated_at, ThreadMetadata.thread_id) < tuple_(*after))
+        query = query.order_by(ThreadMetadata.updated_at.desc(), ThreadMetadata.thread_id.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        rows = query.all()
+        return [
+            {"thread_id": row.thread_id, "title": row.title, "updated_at": row.updated_at}
+            for row in rows
+        ]
+    finally:
+        session.close()
 
 
 def save_thread_title(thread_id: str, title: str):
@@ -136,31 +316,37 @@ def save_thread_title(thread_id: str, title: str):
             new_thread = ThreadMetadata(thread_id=thread_id, title=title)
             session.add(new_thread)
         session.commit()
+    except Exception:
+        thread_metadata_cache.invalidate(thread_id, publish=False)
+        raise
     finally:
         session.close()
+    thread_metadata_cache.set(thread_id, title, publish=True)
 
 
 def touch_thread(thread_id: str):
-    """Update the updated_at timestamp for a thread to mark recent activity"""
-    session = Session()
-    try:
-        existing = session.query(ThreadMetadata).filter_by(thread_id=thread_id).first()
-        if existing:
-            # Trigger the onupdate by setting a field
-            existing.title = existing.title
-            session.commit()
-    finally:
-        session.close()
+    """Mark recent activity on a thread (updated_at is written in batches)"""
+    activity_tracker.record(thread_id)
 
 
 def get_thread_title_from_db(thread_id: str) -> str | None:
-    """Get a thread's title from the database"""
+    """Get a thread's title (None if the thread does not exist)"""
+    found, title = thread_metadata_cache.get(thread_id)
+    if found:
+        return title
+    version = thread_metadata_cache.version()
     session = Session()
     try:
-        thread = session.query(ThreadMetadata).filter_by(thread_id=thread_id).first()
-        return thread.title if thread else None
+        title = session.query(ThreadMetadata.title).filter_by(thread_id=thread_id).scalar()
     finally:
         session.close()
+    thread_metadata_cache.fill(thread_id, title, version)
+    return title
+
+
+def forget_thread_metadata(thread_id: str):
+    """Drop cached metadata of a deleted thread (in every worker)"""
+    thread_metadata_cache.invalidate(thread_id)
 
 
 def get_all_thread_metadata():
@@ -0,0 +1,226 @@
+"""Persistent cache of chunk embeddings
+
+Ingestion used to embed every chunk, even when the same handbook was
+uploaded to dozens of threads or re-uploaded after a small edit. Chunk
+vectors are now cached on disk, keyed by (embedding model id, sha256 of the
+chunk text), and shared by every thread and worker:
+
+- ``index.db`` (SQLite) maps each key to a row of its model's matrix,
+- ``<model>.<dim>.<dtype>.bin`` holds that model's vectors as a raw
+  float32 (or float16, EMBEDDING_CACHE_DTYPE) matrix, read through a
+  memory map and appended to by writers.
+
+Writers serialize on a SQLite write transaction, so workers can share the
+directory. Only chunks without a cached vector are embedded; re-ingesting a
+known document costs parsing only. Delete EMBEDDING_CACHE_DIR to reset the
+cache; set it to an empty value to disable caching.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Sequence
+
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "storage", "embeddings")
+)
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+# Keys per SQLite IN (...) lookup; stays under SQLITE_MAX_VARIABLE_NUMBER.
+_LOOKUP_BATCH = 500
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS matrices ("
+    "model TEXT PRIMARY KEY, dim INTEGER NOT NULL, dtype TEXT NOT NULL, "
+    "file TEXT NOT NULL, rows INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS embeddings ("
+    "model TEXT NOT NULL, sha256 TEXT NOT NULL, row INTEGER NOT NULL, "
+    "PRIMARY KEY (model, sha256)) WITHOUT ROWID",
+)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """(model, sha256(text)) -> vector, stored in SQLite + a memory-mapped matrix"""
+
+    def __init__(self, directory: str = EMBEDDING_CACHE_DIR, dtype: str = EMBEDDING_CACHE_DTYPE):
+        self.directory = directory
+        self.dtype = dtype if dtype in ("float32", "float16") else "float32"
+        self._guard = threading.Lock()
+        self._ready = False
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"), timeout=30)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._ready = True
+        return conn
+
+    def embed(self, model: str, texts: Sequence[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Vectors for texts, calling embed_fn only for texts not cached yet"""
+        if not self.enabled or not texts:
+            return embed_fn(list(texts))
+        try:
+            import numpy  # noqa: F401
+        except ImportError as e:
+            print(f"Warning: embedding cache disabled: {e}")
+            self.directory = ""
+            return embed_fn(list(texts))
+
+        keys = [text_key(text) for text in texts]
+        try:
+            found = self._lookup(model, keys)
+        except Exception as e:
+            print(f"Warning: embedding cache lookup failed: {e}")
+            self.errors += 1
+            found = {}
+
+        # Embed each distinct missing text once.
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = embed_fn(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            try:
+                self._store(model, fresh)
+            except Exception as e:
+                print(f"Warning: embedding cache write failed: {e}")
+                self.errors += 1
+            found.update(fresh)
+
+        with self._guard:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [list(found[key]) for key in keys]
+
+    def _matrix(self, conn: sqlite3.Connection, model: str):
+        return conn.execute("SELECT dim, dtype, file, rows FROM matrices WHERE model = ?", (model,)).fetchone()
+
+    def _lookup(self, model: str, keys: List[str]) -> Dict[str, List[float]]:
+        import numpy as np
+
+        conn = self._connect()
+        try:
+            matrix = self._matrix(conn, model)
+            if matrix is None:
+                return {}
+            dim, dtype, file, rows = matrix
+            unique = list(dict.fromkeys(keys))
+            positions = {}
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                positions.update(conn.execute(
+                    f"SELECT sha256, row FROM embeddings WHERE model = ? AND sha256 IN ({placeholders})",
+                    (model, *batch)
+                ).fetchall())
+        finally:
+            conn.close()
+        if not positions:
+            return {}
+
+        vectors = np.memmap(os.path.join(self.directory, file), dtype=dtype, mode="r", shape=(rows, dim))
+        hits = [(key, row) for key, row in positions.items() if row < rows]
+        block = np.asarray(vectors[[row for _, row in hits]], dtype="float32")
+        return dict(zip((key for key, _ in hits), block.tolist()))
+
+    def _store(self, model: str, fresh: Dict[str, List[float]]) -> None:
+        import numpy as np
+
+        matrix = np.asarray(list(fresh.values()), dtype="float32")
+        if matrix.ndim != 2:
+            return
+        conn = self._connect()
+        try:
+            # The write transaction serializes appends across workers.
+            conn.execute("BEGIN IMMEDIATE")
+            current = self._matrix(conn, model)
+            if current is None:
+                safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)[:80]
+                file = f"{safe}-{text_key(model)[:8]}.{matrix.shape[1]}.{self.dtype}.bin"
+                dim, dtype, rows = matrix.shape[1], self.dtype, 0
+                conn.execute(
+                    "INSERT INTO matrices (model, dim, dtype, file, rows) VALUES (?, ?, ?, ?, 0)",
+                    (model, dim, dtype, file)
+                )
+            else:
+                dim, dtype, file, rows = current
+            if matrix.shape[1] != dim:
+                print(f"Warning: {model} returned {matrix.shape[1]}-d vectors, cache holds {dim}-d; not caching")
+                conn.rollback()
+                return
+
+            # Another worker may have stored some of these meanwhile.
+            stored = set()
+            keys = list(fresh)
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start:start + _LOOKUP_BATCH]
+                stored.update(key for (key,) in conn.execute(
+                    f"SELECT sha256 FROM embeddings WHERE model = ? AND sha256 IN ({','.join('?' * len(batch))})",
+                    (model, *batch)
+                ))
+            keys = [key for key in keys if key not in stored]
+            if not keys:
+                conn.rollback()
+                return
+            matrix = np.asarray([fresh[key] for key in keys], dtype="float32")
+
+            # Rows past the committed count are leftovers of an interrupted
+            # write and are overwritten.
+            path = os.path.join(self.directory, file)
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as handle:
+                handle.seek(rows * dim * np.dtype(dtype).itemsize)
+                handle.write(matrix.astype(dtype).tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+            conn.executemany(
+                "INSERT INTO embeddings (model, sha256, row) VALUES (?, ?, ?)",
+                [(model, key, rows + i) for i, key in enumerate(keys)]
+            )
+            conn.execute("UPDATE matrices SET rows = ? WHERE model = ?", (rows + len(keys), model))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._guard:
+            lookups = self.hits + self.misses
+            stats = {
+                "enabled": self.enabled,
+                "dtype": self.dtype,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+        if self.enabled and self._ready:
+            try:
+                conn = self._connect()
+                try:
+                    stats["vectors"] = dict(conn.execute("SELECT model, rows FROM matrices").fetchall())
+                finally:
+                    conn.close()
+            except Exception as e:
+                stats["error"] = str(e)
+        return stats
+
+
+embedding_cache = EmbeddingCache()
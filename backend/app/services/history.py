@@ -0,0 +1,124 @@
+"""Message read model for conversation history
+
+Loading a conversation through ``chatbot.get_state`` decodes the thread's
+whole latest checkpoint (every message, tool result and document context)
+only to keep the human/AI text. The ``messages`` table keeps that visible
+conversation denormalized, one row per message keyed by (thread_id, seq),
+so history is served newest-first in pages by an indexed range scan.
+
+sync_thread_messages runs at the end of every persisted turn. It compares
+the stored message ids with the thread's current messages and rewrites only
+the suffix that changed: a new turn appends two rows, an edit or
+regenerate replaces the tail. Threads written before the table existed are
+filled the first time their history is read.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+from sqlalchemy import func
+
+from app.database.config import DatabaseConfig
+from app.database.models import Message
+
+PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "100"))
+
+
+def _text(content: Any) -> str:
+    """Plain text of a message's content (str or list of content blocks)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, (str, dict))
+        )
+    return ""
+
+
+def visible_messages(messages) -> List[Dict[str, Optional[str]]]:
+    """The human and non-empty AI messages shown in the chat window"""
+    visible = []
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            role = "human"
+        elif isinstance(message, AIMessage):
+            role = "ai"
+        else:
+            continue
+        content = _text(message.content)
+        if role == "ai" and not content:
+            continue
+        visible.append({"message_id": getattr(message, "id", None), "role": role, "content": content})
+    return visible
+
+
+def sync_thread_messages(thread_id: str, messages) -> int:
+    """Bring the thread's rows in line with messages; returns rows written"""
+    visible = visible_messages(messages)
+    session = DatabaseConfig.get_session_factory()()
+    try:
+        stored = [
+            row.message_id
+            for row in session.query(Message.message_id).filter(
+                Message.thread_id == thread_id
+            ).order_by(Message.seq)
+        ]
+        # Length of the common prefix; messages without an id never match.
+        keep = 0
+        for stored_id, message in zip(stored, visible):
+            if stored_id is None or stored_id != message["message_id"]:
+                break
+            keep += 1
+        if keep == len(stored) == len(visible):
+            return 0
+
+        if keep < len(stored):
+            session.query(Message).filter(
+                Message.thread_id == thread_id, Message.seq >= keep
+            ).delete(synchronize_session=False)
+        session.add_all(
+            Message(thread_id=thread_id, seq=seq, **message)
+            for seq, message in enumerate(visible[keep:], start=keep)
+        )
+        session.commit()
+        return len(visible) - keep
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_message_page(thread_id: str, limit: int = PAGE_SIZE, before: Optional[int] = None) -> Dict[str, Any]:
+    """Newest messages older than seq ``before``, returned oldest-first.
+
+    Besides the messages the page carries ``next_before`` (pass it as
+    ``before`` to get the previous page, None at the start of the thread)
+    and ``human_offset``, the number of human messages before the page,
+    which the edit endpoint's human_index counts from.
+    """
+    session = DatabaseConfig.get_session_factory()()
+    try:
+        query = session.query(Message.seq, Message.role, Message.content).filter(Message.thread_id == thread_id)
+        if before is not None:
+            query = query.filter(Message.seq < before)
+        rows = query.order_by(Message.seq.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+
+        human_offset = 0
+        if rows and rows[0].seq > 0:
+            human_offset = session.query(func.count()).select_from(Message).filter(
+                Message.thread_id == thread_id,
+                Message.seq < rows[0].seq,
+                Message.role == "human"
+            ).scalar()
+        return {
+            "messages": [{"seq": row.seq, "type": row.role, "content": row.content} for row in rows],
+            "next_before": rows[0].seq if has_more else None,
+            "human_offset": human_offset,
+        }
+    finally:
+        session.close()
@@ -1,24 +1,60 @@
+import hashlib
 import json
 import os
-from typing import Dict, Any, Optional, Tuple
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
+import shutil
+import threading
+import time
+import weakref
+from typing import Any, Optional, Tuple
+
+from app.services.retrievers import retriever_cache
 
 # Document types supported for upload (RAG context).
 SUPPORTED_EXTENSIONS = (".pdf", ".md", ".txt")
 
-# Initialize HuggingFace embeddings
-try:
-    _DEFAULT_EMBEDDINGS = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-except Exception as e:
-    print(f"⚠ HuggingFaceEmbeddings initialization failed: {e}")
-    _DEFAULT_EMBEDDINGS = None
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Chunking and search parameters. Persisted indexes record the chunking and
+# embedding model in their manifest and are rebuilt when these change.
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNK_SEPARATORS = ["\n\n", "\n", " ", ""]
+SEARCH_K = 4
+INDEX_FORMAT = 1
+
+# The embedding model (torch + sentence-transformers), the document loaders,
+# FAISS and the text splitter are imported on first use, so workers that
+# never see a document do not pay for them at startup. warm_up() loads them
+# ahead of time.
+_DEFAULT_EMBEDDINGS = None
+_embeddings_loaded = False
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings():
+    """The default HuggingFace embeddings, created on first call (None if unavailable)"""
+    global _DEFAULT_EMBEDDINGS, _embeddings_loaded
+    if _embeddings_loaded:
+        return _DEFAULT_EMBEDDINGS
+    with _embeddings_lock:
+        if not _embeddings_loaded:
+            try:
+                from langchain_huggingface import HuggingFaceEmbeddings
+                _DEFAULT_EMBEDDINGS = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+            except Exception as e:
+                print(f"⚠ HuggingFaceEmbeddings initialization failed: {e}")
+                _DEFAULT_EMBEDDINGS = None
+            _embeddings_loaded = True
+    return _DEFAULT_EMBEDDINGS
+
 
+def warm_up() -> None:
+    """Load the embedding model and document-processing libraries now"""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader  # noqa: F401
+    from langchain_community.vectorstores import FAISS  # noqa: F401
+    from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: F401
+    get_embeddings()
 
-_THREAD_RETRIEVERS: Dict[str, Any] = {}
-_THREAD_METADATA: Dict[str, dict] = {}
 
 _STORAGE_DIR = os.path.join(os.path.dirname(__file__), "..", "storage", "documents")
 os.makedirs(_STORAGE_DIR, exist_ok=True)
@@ -30,6 +66,11 @@ def _thread_paths(thread_id: str, ext: str = ".pdf") -> Tuple[str, str]:
     return doc_path, meta_path
 
 
+def _index_dir(thread_id: str) -> str:
+    """Folder holding the thread's saved FAISS index, docstore and manifest"""
+    return os.path.join(_STORAGE_DIR, f"{thread_id}.index")
+
+
 def _ext_for(filename: str) -> str:
     """Return the lowercase extension (with dot) for a filename, or '' if none."""
     return os.path.splitext(filename or "")[1].lower()
@@ -55,6 +96,8 @@ def _read_metadata(thread_id: str) -> Optional[dict]:
 
 def _load_document(doc_path: str, ext: str):
     """Load a document into LangChain Documents based on its extension."""
+    from langchain_community.document_loaders import PyPDFLoader, TextLoader
+
     if ext == ".pdf":
         loader = PyPDFLoader(doc_path)
     else:
@@ -63,20 +106,155 @@ def _load_document(doc_path: str, ext: str):
     return loader.load()
 
 
-def _build_retriever_from_file(doc_path: str, embeddings: Any, ext: str) -> Tuple[Any, int, int]:
+def _build_index_from_file(doc_path: str, embeddings: Any, ext: str) -> Tuple[Any, int, int]:
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     docs = _load_document(doc_path, ext)
 
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", " ", ""]
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=CHUNK_SEPARATORS
     )
     chunks = splitter.split_documents(docs)
 
-    vector_store = FAISS.from_documents(chunks, embeddings)
-    retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 4})
+    # Only chunks never embedded with this model (by any thread) are embedded.
+    from app.services.embedding_cache import embedding_cache
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = embedding_cache.embed(_embedding_model_id(embeddings), texts, embeddings.embed_documents)
+    vector_store = FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        embeddings,
+        metadatas=[chunk.metadata for chunk in chunks]
+    )
+    return vector_store, len(docs), len(chunks)
+
+
+def _as_retriever(vector_store: Any):
+    return vector_store.as_retriever(search_type="similarity", search_kwargs={"k": SEARCH_K})
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _embedding_model_id(embeddings: Any) -> str:
+    return str(
+        getattr(embeddings, "model_name", None)
+        or getattr(embeddings, "model", None)
+        or type(embeddings).__name__
+    )
 
-    return retriever, len(docs), len(chunks)
+
+def _index_params(embeddings: Any, doc_path: str) -> dict:
+    """What a saved index must have been built with to still be valid"""
+    return {
+        "format": INDEX_FORMAT,
+        "embedding_model": _embedding_model_id(embeddings),
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "separators": CHUNK_SEPARATORS,
+        "source_sha256": _file_sha256(doc_path),
+    }
+
+
+def _save_index(thread_id: str, vector_store: Any, params: dict) -> None:
+    """Write the index, docstore and manifest; replaces any previous index"""
+    folder = _index_dir(thread_id)
+    staging = f"{folder}.tmp-{os.getpid()}-{threading.get_ident()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    vector_store.save_local(staging)
+    manifest = dict(
+        params,
+        vectors=vector_store.index.ntotal,
+        dimension=vector_store.index.d,
+        created_at=time.time(),
+    )
+    with open(os.path.join(staging, "manifest.json"), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle)
+
+    # A directory cannot be renamed over a non-empty one: move the old index
+    # aside first so readers see either the old or the new one, never a mix.
+    retired = f"{staging}.old"
+    if os.path.exists(folder):
+        os.replace(folder, retired)
+    os.replace(staging, folder)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _load_index(thread_id: str, embeddings: Any, params: dict):
+    """The thread's saved vector store, or None if missing or stale"""
+    folder = _index_dir(thread_id)
+    try:
+        with open(os.path.join(folder, "manifest.json"), "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        print(f"[DEBUG RAG] Unreadable index manifest for thread {thread_id}: {exc}")
+        return None
+
+    stale = [key for key, value in params.items() if manifest.get(key) != value]
+    if stale:
+        print(f"[DEBUG RAG] Saved index for thread {thread_id} is stale ({', '.join(stale)} changed)")
+        return None
+
+    from langchain_community.vectorstores import FAISS
+    try:
+        # The docstore is a pickle; it is only ever read from our own storage.
+        return FAISS.load_local(folder, embeddings, allow_dangerous_deserialization=True)
+    except Exception as exc:
+        print(f"[DEBUG RAG] Failed to load saved index for thread {thread_id}: {exc}")
+        return None
+
+
+def _try_save_index(thread_id: str, vector_store: Any, params: dict) -> bool:
+    # A failed save only costs a re-embed on the next rehydration; the
+    # retriever cache retries it if the index is evicted.
+    try:
+        _save_index(thread_id, vector_store, params)
+        return True
+    except Exception as exc:
+        print(f"[DEBUG RAG] Failed to save index for thread {thread_id}: {exc}")
+        return False
+
+
+# Per-thread locks serializing the load/rebuild of a thread's index with
+# other loads and with the save of its evicted retriever; an entry lives
+# only while someone holds (or waits for) it.
+_index_locks = weakref.WeakValueDictionary()
+_index_locks_guard = threading.Lock()
+
+
+def _index_lock(thread_key: str) -> threading.Lock:
+    with _index_locks_guard:
+        lock = _index_locks.get(thread_key)
+        if lock is None:
+            lock = threading.Lock()
+            _index_locks[thread_key] = lock
+        return lock
+
+
+def _spill_index(thread_id: str, retriever: Any) -> None:
+    """Save an evicted retriever whose index was never persisted (spill thread)"""
+    with _index_lock(thread_id):
+        metadata = _read_metadata(thread_id) or {}
+        file_path = metadata.get("file_path")
+        if file_path and os.path.exists(file_path):
+            vector_store = retriever.vectorstore
+            _try_save_index(thread_id, vector_store, _index_params(vector_store.embedding_function, file_path))
+
+
+retriever_cache.spill = _spill_index
+
+
+def _cached_metadata(thread_key: str) -> Optional[dict]:
+    return retriever_cache.metadata(thread_key) or _read_metadata(thread_key)
 
 
 def _get_retriever(thread_id: Optional[str]):
@@ -85,35 +263,55 @@ def _get_retriever(thread_id: Optional[str]):
         return None
 
     thread_key = str(thread_id)
-    if thread_key in _THREAD_RETRIEVERS:
-        return _THREAD_RETRIEVERS[thread_key]
-
-    metadata = _THREAD_METADATA.get(thread_key) or _read_metadata(thread_key)
+    retriever = retriever_cache.get(thread_key)
+    if retriever is not None:
+        return retriever
+
+    # Concurrent misses of one thread load (or re-embed) its index once; the
+    # others wait and take the cached result.
+    with _index_lock(thread_key):
+        retriever = retriever_cache.peek(thread_key)
+        if retriever is not None:
+            return retriever
+        return _load_retriever(thread_key)
+
+
+def _load_retriever(thread_key: str):
+    """Load a thread's saved index, or rebuild it from its file (under its index lock)"""
+    # Not cached (new worker, or evicted): load the saved index.
+    metadata = _read_metadata(thread_key)
     if metadata:
-        _THREAD_METADATA[thread_key] = metadata
         file_path = metadata.get("file_path")
         ext = metadata.get("ext") or _ext_for(file_path or "")
         if file_path and os.path.exists(file_path):
-            if _DEFAULT_EMBEDDINGS is None:
+            embeddings = get_embeddings()
+            if embeddings is None:
                 print("[DEBUG RAG] Embeddings not available to rebuild retriever")
                 return None
             try:
-                retriever, docs_count, chunks_count = _build_retriever_from_file(file_path, _DEFAULT_EMBEDDINGS, ext)
-                _THREAD_RETRIEVERS[thread_key] = retriever
-                metadata.update({
-                    "documents": docs_count,
-                    "chunks": chunks_count
-                })
-                _THREAD_METADATA[thread_key] = metadata
-                _write_metadata(thread_key, metadata)
+                params = _index_params(embeddings, file_path)
+                started = time.perf_counter()
+                vector_store = _load_index(thread_key, embeddings, params)
+                persisted = loaded = vector_store is not None
+                if loaded:
+                    print(f"[DEBUG RAG] Loaded saved index for thread {thread_key} in {time.perf_counter() - started:.3f}s")
+                else:
+                    # No usable saved index: re-embed the document once and save it.
+                    vector_store, docs_count, chunks_count = _build_index_from_file(file_path, embeddings, ext)
+                    metadata.update({
+                        "documents": docs_count,
+                        "chunks": chunks_count
+                    })
+                    _write_metadata(thread_key, metadata)
+                    persisted = _try_save_index(thread_key, vector_store, params)
+                retriever = _as_retriever(vector_store)
+                retriever_cache.put(thread_key, retriever, metadata, persisted=persisted, loaded=loaded)
                 return retriever
             except Exception as exc:
                 print(f"[DEBUG RAG] Failed to rebuild retriever for thread {thread_key}: {exc}")
                 return None
 
-    print(f"[DEBUG RAG] Retriever not found for thread {thread_id}")
-    print(f"[DEBUG RAG] Available threads: {list(_THREAD_RETRIEVERS.keys())}")
-    print(f"[DEBUG RAG] Metadata threads: {list(_THREAD_METADATA.keys())}")
+    print(f"[DEBUG RAG] Retriever not found for thread {thread_key}")
     return None
 
 
@@ -123,7 +321,7 @@ def ingest_document(file_bytes: bytes, thread_id: str, filename: Optional[str] =
     it for the thread. Returns a summary dict surfaced in the UI.
     """
     if embeddings is None:
-        embeddings = _DEFAULT_EMBEDDINGS
+        embeddings = get_embeddings()
 
     if embeddings is None:
         raise ValueError(
@@ -138,7 +336,9 @@ def ingest_document(file_bytes: bytes, thread_id: str, filename: Optional[str] =
     with open(doc_path, "wb") as handle:
         handle.write(file_bytes)
 
-    retriever, docs_count, chunks_count = _build_retriever_from_file(doc_path, embeddings, ext)
+    vector_store, docs_count, chunks_count = _build_index_from_file(doc_path, embeddings, ext)
+    persisted = _try_save_index(str(thread_id), vector_store, _index_params(embeddings, doc_path))
+    retriever = _as_retriever(vector_store)
 
     metadata = {
         "filename": filename or os.path.basename(doc_path),
@@ -148,9 +348,8 @@ def ingest_document(file_bytes: bytes, thread_id: str, filename: Optional[str] =
         "ext": ext,
     }
 
-    _THREAD_RETRIEVERS[str(thread_id)] = retriever
-    _THREAD_METADATA[str(thread_id)] = metadata
     _write_metadata(str(thread_id), metadata)
+    retriever_cache.put(str(thread_id), retriever, metadata, persisted=persisted)
 
     return {
         "filename": metadata["filename"],
@@ -172,7 +371,7 @@ def retrieve_from_document(query: str, thread_id: str) -> dict:
     retriever = _get_retriever(thread_id)
     if retriever is None:
         # Check if we have metadata but lost the retriever (server restart)
-        if str(thread_id) in _THREAD_METADATA or _read_metadata(str(thread_id)):
+        if _read_metadata(str(thread_id)):
             return {
                 "error": "Document metadata exists but retriever was lost. Please re-upload the document.",
                 "query": query,
@@ -198,15 +397,15 @@ def retrieve_from_document(query: str, thread_id: str) -> dict:
         "query": query,
         "context": context,
         "metadata": metadata,
-        "source_file": _THREAD_METADATA.get(str(thread_id), {}).get("filename"),
+        "source_file": (_cached_metadata(str(thread_id)) or {}).get("filename"),
     }
 
 
 def has_document(thread_id: str) -> bool:
     """Check if a thread has an uploaded document."""
     thread_key = str(thread_id)
-    has_retriever = thread_key in _THREAD_RETRIEVERS
-    metadata = _THREAD_METADATA.get(thread_key) or _read_metadata(thread_key)
+    has_retriever = thread_key in retriever_cache
+    metadata = _cached_metadata(thread_key)
     has_file = bool(metadata and metadata.get("file_path") and os.path.exists(metadata["file_path"]))
     print(f"[DEBUG RAG] has_document check - thread: {thread_id}, retriever: {has_retriever}, metadata: {bool(metadata)}, file: {has_file}")
     # Return True if retriever exists or stored file exists to allow rehydration
@@ -216,8 +415,7 @@ def has_document(thread_id: str) -> bool:
 def get_document_info(thread_id: str) -> Optional[dict]:
     """Get metadata about the uploaded document for a thread."""
     thread_key = str(thread_id)
-    metadata = _THREAD_METADATA.get(thread_key) or _read_metadata(thread_key)
+    metadata = _cached_metadata(thread_key)
     if metadata and metadata.get("file_path") and os.path.exists(metadata["file_path"]):
-        _THREAD_METADATA[thread_key] = metadata
         return metadata
     return None
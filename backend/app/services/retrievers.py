@@ -0,0 +1,148 @@
+"""In-process cache of document retrievers
+
+Every thread that ever touched a document used to keep its FAISS index
+(and RAG metadata) in module-level dicts for the life of the worker. The
+retrievers now live in a cache bounded by an estimate of their memory:
+
+- an entry is sized as vectors x bytes per vector plus the docstore text
+  and metadata,
+- least recently used threads are evicted once RETRIEVER_CACHE_MAX_BYTES
+  is exceeded; indexes are persisted at ingest, so an evicted thread is
+  reloaded from disk on its next query (an index whose save failed is
+  saved again on eviction, in a background thread so the request that
+  caused the eviction does not wait for the disk),
+- hits, misses, loads from disk and evictions are counted (see
+  /api/health/details).
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.database.cache import estimate_size
+
+RETRIEVER_CACHE_MAX_BYTES = int(os.getenv("RETRIEVER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Per-chunk bookkeeping beyond its text: Document object, docstore and id maps.
+_CHUNK_OVERHEAD = 400
+
+
+def vector_store_bytes(vector_store: Any) -> int:
+    """Estimated resident size of a FAISS vector store"""
+    index = vector_store.index
+    try:
+        per_vector = index.sa_code_size()
+    except Exception:
+        per_vector = index.d * 4  # flat float32
+    size = index.ntotal * per_vector
+    for doc in getattr(vector_store.docstore, "_dict", {}).values():
+        size += len(doc.page_content) + estimate_size(doc.metadata) + _CHUNK_OVERHEAD
+    return size
+
+
+class RetrieverCache:
+    """Size-bounded LRU of thread_id -> (retriever, metadata)"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else RETRIEVER_CACHE_MAX_BYTES
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._guard = threading.Lock()
+        # Called as spill(thread_id, retriever) when an entry that is not
+        # persisted yet is evicted; runs on the spill thread, one at a time.
+        self.spill: Optional[Callable[[str, Any], None]] = None
+        self._spiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retriever-spill")
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, thread_id: str):
+        """The cached retriever, or None (counted as a miss)"""
+        with self._guard:
+            entry = self._entries.get(thread_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(thread_id)
+            self.hits += 1
+            return entry["retriever"]
+
+    def peek(self, thread_id: str):
+        """The cached retriever or None, without touching LRU order or counters"""
+        with self._guard:
+            entry = self._entries.get(thread_id)
+            return entry["retriever"] if entry else None
+
+    def metadata(self, thread_id: str) -> Optional[dict]:
+        """RAG metadata of a cached thread, without touching LRU order or counters"""
+        with self._guard:
+            entry = self._entries.get(thread_id)
+            return entry["metadata"] if entry else None
+
+    def __contains__(self, thread_id: str) -> bool:
+        with self._guard:
+            return thread_id in self._entries
+
+    def put(self, thread_id: str, retriever: Any, metadata: dict, persisted: bool = True, loaded: bool = False) -> None:
+        """Cache a thread's retriever; loaded marks one read back from disk"""
+        size = vector_store_bytes(retriever.vectorstore)
+        spilled = []
+        with self._guard:
+            if loaded:
+                self.loads += 1
+            current = self._entries.pop(thread_id, None)
+            if current is not None:
+                self._bytes -= current["bytes"]
+            if size > self.max_bytes:
+                # Larger than the whole budget: serve it without keeping it,
+                # saving it like any other evicted entry.
+                self.evictions += 1
+                if not persisted:
+                    spilled.append((thread_id, retriever))
+            else:
+                self._entries[thread_id] = {
+                    "retriever": retriever,
+                    "metadata": metadata,
+                    "bytes": size,
+                    "persisted": persisted,
+                }
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted["bytes"]
+                self.evictions += 1
+                if not evicted["persisted"]:
+                    spilled.append((evicted_id, evicted["retriever"]))
+        if self.spill is not None:
+            for evicted_id, evicted_retriever in spilled:
+                self._spiller.submit(self._spill, evicted_id, evicted_retriever)
+
+    def _spill(self, thread_id: str, retriever: Any) -> None:
+        try:
+            self.spill(thread_id, retriever)
+        except Exception as e:
+            print(f"Warning: failed to save evicted retriever of thread {thread_id}: {e}")
+
+    def discard(self, thread_id: str) -> None:
+        with self._guard:
+            entry = self._entries.pop(thread_id, None)
+            if entry is not None:
+                self._bytes -= entry["bytes"]
+
+    def stats(self) -> dict:
+        with self._guard:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+retriever_cache = RetrieverCache()
@@ -1,31 +1,33 @@
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+import threading
 import uuid
 import os
 
 load_dotenv()
-# api = os.getenv("OPENAI_API_KEY")
-
-# model = ChatOpenAI(
-#     model="openai/gpt-oss-120b",
-#     openai_api_key=api,
-#     base_url="https://api.canopywave.io/v1"
-#     )
 
 api = os.getenv("GROQ_API_KEY")
 
-model = ChatGroq(
-    model="openai/gpt-oss-120b",
-    api_key=api
-    )
+_model = None
+_model_lock = threading.Lock()
+
 
 class StructuredModel(BaseModel):
     title: str = Field(description="A short chat title (<= 5 words).")
 
 
-structured_model = model.with_structured_output(StructuredModel)
+def get_model():
+    """The title LLM client, created on first call (importing needs no API key)"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from langchain_groq import ChatGroq
+                _model = ChatGroq(
+                    model="openai/gpt-oss-120b",
+                    api_key=api
+                    )
+    return _model
 
 
 def generate_id_name(question: str):
@@ -37,14 +39,14 @@ def generate_id_name(question: str):
     """
 
     try:
-        llm = structured_model.invoke(prompt)
+        llm = get_model().with_structured_output(StructuredModel).invoke(prompt)
         if llm and hasattr(llm, "title") and llm.title:
             return llm.title
     except Exception as e:
         print("STRUCTURED PARSE ERROR:", e)
 
     # fallback to raw text
-    raw = model.invoke(prompt)
+    raw = get_model().invoke(prompt)
     return raw.content.strip()
 
 
@@ -0,0 +1,197 @@
+"""Batched thread title generation
+
+generate_id_name spends one structured-output LLM call (two when parsing
+fails) per new thread. TitleService queues title requests instead and
+sends them to the model in micro-batches: one structured-output call
+returns the titles of up to BATCH_SIZE messages. Titles are cached by a
+hash of the message, and when the queue is saturated (or the model call
+fails) a title is extracted from the message locally, so traffic spikes
+never turn into a queue of LLM calls or rate-limit errors.
+"""
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from app.services.thread import get_model
+
+# Words skipped at the start of an extractive title ("can you explain ...").
+_FILLER_WORDS = {
+    "a", "an", "the", "please", "can", "could", "would", "will", "you", "u",
+    "i", "me", "my", "we", "to", "hi", "hello", "hey", "help", "want", "need",
+    "tell", "about", "so", "ok", "okay",
+}
+_WORD = re.compile(r"[\w'+#.-]+")
+
+
+class BatchTitles(BaseModel):
+    titles: List[str] = Field(description="One short chat title (<= 5 words) per message, in order.")
+
+
+def message_key(message: str) -> str:
+    """Cache key of a message: hash of its whitespace/case-normalized text"""
+    normalized = " ".join(message.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def extractive_title(message: str, max_words: int = 5) -> str:
+    """Cheap local title: the first few meaningful words of the first line"""
+    first_line = next((line for line in message.strip().splitlines() if line.strip()), "")
+    words = [w.strip(".-'") for w in _WORD.findall(first_line)]
+    # Drop markdown/punctuation-only tokens ("#", "-", "...").
+    words = [w for w in words if any(c.isalnum() for c in w)]
+    start = 0
+    while start < len(words) - 1 and words[start].lower() in _FILLER_WORDS:
+        start += 1
+    words = words[start:start + max_words]
+    if not words:
+        return "New Chat"
+    title = " ".join(words)
+    return title[0].upper() + title[1:]
+
+
+def _clean_title(title: str) -> str:
+    return title.strip().strip('"\'').strip()
+
+
+class TitleService:
+    """Micro-batching title generator with a message-hash cache"""
+
+    BATCH_SIZE = int(os.getenv("TITLE_BATCH_SIZE", "8"))
+    # Seconds the first request of a batch waits for others to join it.
+    BATCH_WAIT = float(os.getenv("TITLE_BATCH_WAIT", "0.05"))
+    # Pending requests beyond this get an extractive title right away.
+    QUEUE_MAX = int(os.getenv("TITLE_QUEUE_MAX", "200"))
+    CACHE_MAX_ENTRIES = int(os.getenv("TITLE_CACHE_MAX_ENTRIES", "5000"))
+
+    def __init__(self, llm=None):
+        self._llm = llm
+        # Built on the first batch, so importing needs no LLM client.
+        self._structured = None
+        self._queue: queue.Queue = queue.Queue()
+        self._cache: OrderedDict = OrderedDict()
+        self._guard = threading.Lock()
+        self._worker = None
+        self.requests = 0
+        self.cache_hits = 0
+        self.llm_calls = 0
+        self.llm_titles = 0
+        self.fallbacks = 0
+
+    def submit(self, message: str) -> Future:
+        """Future resolving to a title for message"""
+        future: Future = Future()
+        key = message_key(message)
+        with self._guard:
+            self.requests += 1
+            title = self._cache.get(key)
+            if title is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            elif self._queue.qsize() >= self.QUEUE_MAX:
+                self.fallbacks += 1
+                title = extractive_title(message)
+            else:
+                self._queue.put((key, message, future))
+                self._ensure_worker()
+                return future
+        future.set_result(title)
+        return future
+
+    def generate(self, message: str) -> str:
+        """Blocking convenience wrapper around submit"""
+        return self.submit(message).result()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name="thread-titles", daemon=True)
+            self._worker.start()
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.BATCH_WAIT
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                print(f"Error in title batch: {e}")
+                for _, message, future in batch:
+                    if not future.done():
+                        future.set_result(extractive_title(message))
+
+    def _run_batch(self, batch) -> None:
+        # Identical messages in one batch share a slot in the prompt.
+        unique: OrderedDict = OrderedDict()
+        for key, message, future in batch:
+            unique.setdefault(key, (message, []))[1].append(future)
+
+        titles = {}
+        try:
+            titles = self._ask_model([message for message, _ in unique.values()], list(unique))
+        except Exception as e:
+            print(f"Error generating titles: {e}")
+
+        with self._guard:
+            for key, title in titles.items():
+                self._cache[key] = title
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+            self.fallbacks += sum(len(futures) for key, (_, futures) in unique.items() if key not in titles)
+
+        for key, (message, futures) in unique.items():
+            title = titles.get(key) or extractive_title(message)
+            for future in futures:
+                future.set_result(title)
+
+    def _ask_model(self, messages: List[str], keys: List[str]) -> dict:
+        numbered = "\n".join(f"{i}. {' '.join(m.split())[:500]}" for i, m in enumerate(messages, 1))
+        prompt = f"""
+    Create a chat title in 5 words or fewer for each of the {len(messages)} messages below.
+    Return exactly {len(messages)} titles, in the same order. Titles only, no explanation.
+    Messages:
+    {numbered}
+    """
+        self.llm_calls += 1
+        if self._structured is None:
+            self._structured = (self._llm or get_model()).with_structured_output(BatchTitles)
+        result = self._structured.invoke(prompt)
+        titles = [_clean_title(t) for t in (result.titles if result else [])]
+        if len(titles) != len(messages):
+            # A miscounted answer cannot be matched to messages reliably.
+            print(f"Title batch returned {len(titles)} titles for {len(messages)} messages")
+            return {}
+        titles = {key: title for key, title in zip(keys, titles) if title}
+        self.llm_titles += len(titles)
+        return titles
+
+    def stats(self) -> dict:
+        with self._guard:
+            return {
+                "queued": self._queue.qsize(),
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self._cache),
+                "llm_calls": self.llm_calls,
+                "llm_titles": self.llm_titles,
+                "fallbacks": self.fallbacks,
+                "batch_size": self.BATCH_SIZE,
+            }
+
+
+title_service = TitleService()
@@ -0,0 +1,65 @@
+"""Optional warm-up of lazily loaded components
+
+Heavy components load on first use so a worker boots quickly: the
+embedding model and document libraries (app.services.rag) and the blog
+graph (app.tools.blogs). A worker that would rather pay that cost at
+startup than on its first request lists them in WARMUP, e.g.
+``WARMUP=embeddings,blogs`` (or ``all``); they then load in a background
+thread right after startup, without delaying it.
+"""
+import importlib
+import os
+import threading
+import time
+from typing import Dict, Iterable
+
+WARMUP = os.getenv("WARMUP", "")
+
+
+def _warm_embeddings() -> None:
+    from app.services.rag import warm_up
+    warm_up()
+
+
+def _warm_blogs() -> None:
+    importlib.import_module("app.tools.blogs.graph")
+
+
+HOOKS = {
+    "embeddings": _warm_embeddings,
+    "blogs": _warm_blogs,
+}
+
+
+def _names(spec) -> list:
+    if isinstance(spec, str):
+        spec = [name.strip().lower() for name in spec.split(",")]
+    names = [name for name in spec if name]
+    if "all" in names:
+        return list(HOOKS)
+    return names
+
+
+def warm_up(names: Iterable[str]) -> Dict[str, float]:
+    """Run the named hooks now; returns seconds spent per hook"""
+    timings = {}
+    for name in _names(names):
+        hook = HOOKS.get(name)
+        if hook is None:
+            print(f"Warning: unknown warm-up component '{name}' (expected one of: {', '.join(HOOKS)}, all)")
+            continue
+        started = time.perf_counter()
+        try:
+            hook()
+        except Exception as e:
+            print(f"Warning: warm-up of {name} failed: {e}")
+            continue
+        timings[name] = round(time.perf_counter() - started, 3)
+        print(f"Warmed up {name} in {timings[name]}s")
+    return timings
+
+
+def start() -> None:
+    """Warm up the components listed in WARMUP in the background"""
+    if _names(WARMUP):
+        threading.Thread(target=warm_up, args=(WARMUP,), name="warm-up", daemon=True).start()
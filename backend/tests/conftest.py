@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database.config import DatabaseConfig  # noqa: E402
+from app.database.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Point DatabaseConfig at a fresh SQLite file with the core tables"""
+    path = tmp_path / "chatbot.db"
+    monkeypatch.setattr(DatabaseConfig, "get_connection_url", classmethod(lambda cls: f"sqlite:///{path}"))
+    monkeypatch.setattr(
+        DatabaseConfig, "get_async_connection_url", classmethod(lambda cls: f"sqlite+aiosqlite:///{path}")
+    )
+    for name in ("_engine", "_session_factory", "_async_engine", "_async_session_factory"):
+        monkeypatch.setattr(DatabaseConfig, name, None)
+    engine = DatabaseConfig.get_engine()
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
@@ -0,0 +1,114 @@
+"""The cross-process checkpoint lock must be released on the connection that took it.
+
+MySQL's GET_LOCK belongs to a connection. SQLite has no such lock, so these
+tests stand one in (owned by the DBAPI connection, released only by its
+owner, like RELEASE_LOCK) and check that a second session can take the
+lock again after an op.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database.config import DatabaseConfig
+from app.database.locks import ThreadLockTimeout
+from app.database.mysql_checkpoint import MySQLCheckpointSaver
+
+
+class ConnectionScopedLocks:
+    """GET_LOCK/RELEASE_LOCK semantics keyed by the DBAPI connection"""
+
+    def __init__(self):
+        self.owners = {}
+        self.released_by_owner = []
+
+    @staticmethod
+    def _dbapi(session):
+        return session.connection().connection.dbapi_connection
+
+    def acquire(self, session, thread_id):
+        owner = self.owners.get(thread_id)
+        if owner is not None and owner is not self._dbapi(session):
+            raise ThreadLockTimeout(f"Timed out waiting for checkpoint lock of thread {thread_id}")
+        self.owners[thread_id] = self._dbapi(session)
+
+    def release(self, session, thread_id):
+        mine = self.owners.get(thread_id) is self._dbapi(session)
+        self.released_by_owner.append(mine)
+        if mine:
+            del self.owners[thread_id]
+
+
+@pytest.fixture
+def saver(sqlite_db, monkeypatch):
+    saver = MySQLCheckpointSaver()
+    locks = ConnectionScopedLocks()
+    monkeypatch.setattr(saver.locks, "_acquire", locks.acquire)
+    monkeypatch.setattr(saver.locks, "_release", locks.release)
+    saver.fake_locks = locks
+    return saver
+
+
+def _warm_pool(engine, connections=2):
+    # Leave several idle connections in the (FIFO) pool, so a connection
+    # given back at commit is not the next one checked out.
+    held = [engine.connect() for _ in range(connections)]
+    for conn in held:
+        conn.close()
+
+
+def _touch(session):
+    session.execute(text("SELECT 1"))
+    return "done"
+
+
+def _lock_again(engine, saver, thread_id):
+    # A second session on its own connection, as another worker would be.
+    with engine.connect() as conn:
+        with Session(bind=conn) as other:
+            saver.locks._acquire(other, thread_id)
+            saver.locks._release(other, thread_id)
+
+
+def test_lock_is_released_on_its_own_connection(sqlite_db, saver):
+    _warm_pool(sqlite_db)
+
+    assert saver._run("thread-1", _touch) == "done"
+
+    assert saver.fake_locks.released_by_owner == [True]
+    assert saver.fake_locks.owners == {}
+    _lock_again(sqlite_db, saver, "thread-1")
+
+
+def test_lock_is_released_after_a_failed_op(sqlite_db, saver):
+    _warm_pool(sqlite_db)
+
+    def _fail(session):
+        session.execute(text("SELECT 1"))
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        saver._run("thread-1", _fail)
+
+    assert saver.fake_locks.owners == {}
+    _lock_again(sqlite_db, saver, "thread-1")
+
+
+def test_async_lock_is_released_on_its_own_connection(sqlite_db, saver):
+    pytest.importorskip("aiosqlite")
+
+    async def _ops():
+        engine = DatabaseConfig.get_async_engine()
+        held = [await engine.connect() for _ in range(2)]
+        for conn in held:
+            await conn.close()
+        # Two ops in a row: the second one only gets the lock if the first
+        # released it.
+        assert await saver._arun("thread-1", _touch) == "done"
+        assert await saver._arun("thread-1", _touch) == "done"
+
+    asyncio.run(_ops())
+
+    assert saver.fake_locks.released_by_owner == [True, True]
+    _lock_again(sqlite_db, saver, "thread-1")
@@ -118,6 +118,12 @@ function App() {
     fetchThreads();
   };
 
+  // The backend titles a new thread in parallel with the answer and pushes
+  // the result on the chat stream; refresh the sidebar to show it.
+  const handleTitleGenerated = () => {
+    if (!isTempChat) fetchThreads();
+  };
+
   const {
     messages,
     loading: chatLoading,
@@ -126,9 +132,12 @@ function App() {
     regenerate,
     editMessage,
     loadMessages,
+    loadOlderMessages,
+    hasOlderMessages,
+    loadingOlder,
     streamingProgress,
     stop,
-  } = useChat(currentThreadId, handleThreadCreated, skipLoadRef, isTempChat);
+  } = useChat(currentThreadId, handleThreadCreated, skipLoadRef, isTempChat, handleTitleGenerated);
 
   // Centered layout (welcome heading + input in the middle of the viewport)
   // only when the conversation has no messages yet. Driven purely by message
@@ -361,6 +370,9 @@ function App() {
               streamingProgress={streamingProgress}
               onRegenerate={regenerate}
               onEditMessage={editMessage}
+              hasOlder={hasOlderMessages}
+              loadingOlder={loadingOlder}
+              onLoadOlder={loadOlderMessages}
             />
           </div>
 
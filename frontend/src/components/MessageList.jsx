@@ -204,9 +204,20 @@ const markdownComponents = {
   br: () => <br />,
 };
 
-const MessageList = ({ messages, loading, streaming, streamingProgress, onRegenerate, onEditMessage }) => {
+const MessageList = ({
+  messages,
+  loading,
+  streaming,
+  streamingProgress,
+  onRegenerate,
+  onEditMessage,
+  hasOlder = false,
+  loadingOlder = false,
+  onLoadOlder,
+}) => {
   const messagesEndRef = useRef(null);
   const previousLengthRef = useRef(0);
+  const lastMessageRef = useRef(null);
   const [editIndex, setEditIndex] = useState(null);
   const [editValue, setEditValue] = useState('');
 
@@ -216,9 +227,15 @@ const MessageList = ({ messages, loading, streaming, streamingProgress, onRegene
 
   useEffect(() => {
     // Always keep the latest content in view: initial load, switching between
-    // conversations, sending a new message, and live streaming.
-    scrollToBottom();
+    // conversations, sending a new message, and live streaming. Older pages
+    // prepended above (same last message) keep the current position.
+    const lastMessage = messages[messages.length - 1] || null;
+    const prepended = messages.length > previousLengthRef.current
+      && previousLengthRef.current > 0
+      && lastMessage === lastMessageRef.current;
+    if (!prepended) scrollToBottom();
     previousLengthRef.current = messages.length;
+    lastMessageRef.current = lastMessage;
   }, [messages, streaming]);
 
   const renderMessage = (message, index) => {
@@ -404,6 +421,19 @@ const MessageList = ({ messages, loading, streaming, streamingProgress, onRegene
 
   return (
     <div className="flex-1 overflow-y-auto">
+      {hasOlder && (
+        <div className="py-3 px-4 flex justify-center">
+          <button
+            type="button"
+            onClick={onLoadOlder}
+            disabled={loadingOlder}
+            className="inline-flex items-center gap-2 px-3 py-1.5 rounded-md text-sm text-gray-400 transition-colors hover:bg-white/5 hover:text-gray-200 disabled:opacity-50"
+          >
+            {loadingOlder && <Loader2 className="animate-spin" size={14} />}
+            Load earlier messages
+          </button>
+        </div>
+      )}
       {messages.map((message, index) => renderMessage(message, index))}
 
       {loading && !streaming && (
@@ -1,15 +1,23 @@
 import { useState, useEffect, useRef } from 'react';
 import { chatService } from '../services/api';
 
-export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = false) => {
+export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = false, onTitleGenerated) => {
   const [messages, setMessages] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [streamingProgress, setStreamingProgress] = useState(null);
   const eventSourceRef = useRef(null);
   const lastPromptRef = useRef('');
+  // History is paged newest-first: cursor of the next older page (null when
+  // everything is loaded) and the number of human turns before the loaded
+  // ones, which edit indices are counted from.
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const humanOffsetRef = useRef(0);
 
   useEffect(() => {
+    setOlderCursor(null);
+    humanOffsetRef.current = 0;
     if (threadId) {
       // When a brand-new thread was just created by streaming the first
       // message, the UI already holds the messages — skip the backend reload
@@ -31,6 +39,8 @@ export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = fal
       setLoading(true);
       const data = await chatService.getThreadMessages(threadId);
       setMessages(data.messages || []);
+      setOlderCursor(data.next_before ?? null);
+      humanOffsetRef.current = data.human_offset || 0;
       setError(null);
     } catch (err) {
       setError(err.message);
@@ -40,6 +50,22 @@ export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = fal
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!threadId || olderCursor === null || loadingOlder) return;
+
+    try {
+      setLoadingOlder(true);
+      const data = await chatService.getThreadMessages(threadId, olderCursor);
+      setMessages(prev => [...(data.messages || []), ...prev]);
+      setOlderCursor(data.next_before ?? null);
+      humanOffsetRef.current = data.human_offset || 0;
+    } catch (err) {
+      console.error('Error loading older messages:', err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const updateProgressStep = (stepLabel, status) => {
     setStreamingProgress(prev => {
       if (!prev) return null;
@@ -223,6 +249,9 @@ export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = fal
             aiResponse += data.content;
             updateProgressStep('Writing sections...', 'completed');
             updateProgressStep('Finalizing...', 'completed');
+          } else if (data.message_type === 'title') {
+            // Generated in the background while the answer streams.
+            if (onTitleGenerated) onTitleGenerated(data.thread_id, data.title);
           }
 
           if (data.done) {
@@ -321,7 +350,8 @@ export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = fal
     if (!threadId || !newContent.trim()) return;
 
     // 0-based index of the edited human message among all human turns
-    const humanIndex = messages.slice(0, messageIndex + 1).filter(m => m.type === 'human').length - 1;
+    const humanIndex = humanOffsetRef.current
+      + messages.slice(0, messageIndex + 1).filter(m => m.type === 'human').length - 1;
     const targetMsg = messages[messageIndex];
     const tools = targetMsg?.tools && targetMsg.tools.length > 0 ? targetMsg.tools : [];
 
@@ -391,6 +421,9 @@ export const useChat = (threadId, onThreadCreated, skipLoadRef, isTempChat = fal
     regenerate,
     editMessage,
     loadMessages,
+    loadOlderMessages,
+    hasOlderMessages: olderCursor !== null,
+    loadingOlder,
     streamingProgress,
     stop,
   };
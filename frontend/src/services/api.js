@@ -142,13 +142,23 @@ export const chatService = {
     return response.data;
   },
 
-  // Get messages from a specific thread
-  getThreadMessages: async (threadId) => {
-    const response = await api.get(`/threads/${threadId}`);
+  // Get the newest page of a thread's messages; pass `before` (a page's
+  // next_before) to get the page preceding it
+  getThreadMessages: async (threadId, before = null) => {
+    const params = before !== null && before !== undefined ? { before } : {};
+    const response = await api.get(`/threads/${threadId}`, { params });
     return response.data;
   },
 
-  // Update thread title
+  // Full-text search across all conversations (snippets contain <mark> tags)
+  searchMessages: async (query, { limit = 20, offset = 0, threadId = null } = {}) => {
+    const params = { q: query, limit, offset };
+    if (threadId) params.thread_id = threadId;
+    const response = await api.get('/search', { params });
+    return response.data;
+  },
+
+    // Update thread title
   updateThreadTitle: async (threadId, title) => {
     const response = await api.put(`/threads/${threadId}/title`, { title });
     return response.data;
@@ -160,6 +170,12 @@ export const chatService = {
     return response.data;
   },
 
+  // Delete many threads in one request
+  deleteThreads: async (threadIds) => {
+    const response = await api.delete('/threads', { data: { thread_ids: threadIds } });
+    return response.data;
+  },
+
   // Upload PDF
   uploadPDF: async (threadId, file) => {
     const formData = new FormData();